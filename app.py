@@ -1,25 +1,121 @@
 import streamlit as st
 import requests
 import pandas as pd
-from io import StringIO
+import numpy as np
 import folium
-from streamlit_folium import folium_static, st_folium
-from datetime import datetime, timedelta
+from streamlit_folium import st_folium
+from datetime import date, datetime, timedelta, timezone
 import sqlite3
 from folium import plugins
-import tempfile
-from fpdf import FPDF
 import os
-from functools import partial
+import json
+import hashlib
+import zlib
+from functools import cached_property, partial
 from dotenv import load_dotenv
+from laudos import generate_technical_report, render_laudo_pdf
 import plotly.express as px
 import plotly.graph_objects as go
 import math
+import random
+import time
+import threading
+import logging
+import multiprocessing
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from streamlit.runtime.scriptrunner_utils.script_run_context import SCRIPT_RUN_CONTEXT_ATTR_NAME
+
+logger = logging.getLogger(__name__)
 
 # Carregar variáveis de ambiente
 load_dotenv()
 NASA_API_KEY = os.getenv("NASA_API_KEY", "de744659515921a11cf8cabac3dfed1e")
-NASA_FIRMS_API = "https://firms.modaps.eosdis.nasa.gov/api/area/csv/{api_key}/VIIRS_NOAA20_NRT/{area}/1/{date}"
+NASA_FIRMS_API = "https://firms.modaps.eosdis.nasa.gov/api/area/csv/{api_key}/VIIRS_NOAA20_NRT/{area}/{day_range}/{date}"
+
+# Tempo máximo (segundos) que a interface espera por cada fonte de dados
+UPSTREAM_TIMEOUTS = {
+    "weather": float(os.getenv("WEATHER_FETCH_TIMEOUT", "20")),
+    "fire": float(os.getenv("FIRE_FETCH_TIMEOUT", "30")),
+    "air_quality": float(os.getenv("AIR_QUALITY_FETCH_TIMEOUT", "15")),
+}
+
+# Cliente HTTP compartilhado (Open-Meteo e NASA FIRMS)
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "30"))
+HTTP_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+HTTP_BACKOFF_FACTOR = float(os.getenv("HTTP_BACKOFF_FACTOR", "0.5"))
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "16"))
+
+# Conexões SQLite abertas por banco, compartilhadas pelas sessões do processo
+SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "8"))
+
+# Cache persistente de respostas (compartilhado entre processos e reinícios)
+RESPONSE_CACHE_DB = os.getenv("RESPONSE_CACHE_DB", "weather_cache.db")
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_MB", "256")) * 1024 * 1024
+RESPONSE_CACHE_STALE_SECONDS = int(os.getenv("RESPONSE_CACHE_STALE_SECONDS", "3600"))
+
+# Gráficos Plotly já serializados, por (visão, localização, versão dos dados, opções)
+FIGURE_CACHE_MAX_ENTRIES = int(os.getenv("FIGURE_CACHE_MAX_ENTRIES", "256"))
+
+# Resolução (graus) da grade de agregação dos focos de incêndio no mapa
+FIRE_GRID_DEGREES = float(os.getenv("FIRE_GRID_DEGREES", "0.05"))
+
+# Arquivo local dos focos VIIRS da região de cobertura
+FIRE_DB = os.getenv("FIRE_DB", "fire_detections.db")
+FIRE_COVERAGE_AREA = os.getenv("FIRE_COVERAGE_AREA", "-74,-34,-34,6")  # oeste,sul,leste,norte (Brasil)
+FIRE_INDEX_DEGREES = 0.25  # tamanho da célula do índice espacial
+FIRE_RETENTION_DAYS = int(os.getenv("FIRE_RETENTION_DAYS", "10"))
+FIRE_SETTLE_DAYS = 2  # dias (UTC) que ainda recebem novas passagens de satélite
+FIRE_REFRESH_SECONDS = int(os.getenv("FIRE_REFRESH_SECONDS", "600"))
+FIRE_COLUMNS = ["latitude", "longitude", "acq_date", "acq_time", "satellite",
+                "confidence", "frp", "daynight", "bright_ti4"]
+FIRE_DTYPES = {
+    "latitude": "float32",
+    "longitude": "float32",
+    "acq_time": "Int16",  # inteiro anulável: linhas sem horário não derrubam a conversão
+    "satellite": "category",
+    "confidence": "category",
+    "frp": "float32",
+    "daynight": "category",
+    "bright_ti4": "float32",
+}
+FIRE_REQUIRED_COLUMNS = ["latitude", "longitude", "acq_date"]
+FIRE_CSV_CHUNK_ROWS = 50_000
+
+# Arquivo local de dados históricos diários
+HISTORY_DB = os.getenv("HISTORY_DB", "weather_history.db")
+ARCHIVE_SETTLE_DAYS = int(os.getenv("ARCHIVE_SETTLE_DAYS", "5"))  # dias recentes ainda sujeitos a revisão
+HISTORY_DAILY_VARIABLES = [
+    "temperature_2m_max", "temperature_2m_min", "precipitation_sum",
+    "wind_speed_10m_max", "wind_direction_10m_dominant"
+]
+
+# Banco de laudos técnicos
+REPORTS_DB = os.getenv("REPORTS_DB", "weather_reports.db")
+
+# Fila de geração de laudos em segundo plano
+REPORT_JOB_WORKERS = int(os.getenv("REPORT_JOB_WORKERS", "2"))
+REPORT_JOB_POLL_SECONDS = 2
+REPORT_JOB_STALE_SECONDS = 300  # jobs "running" sem atualização por mais tempo são retomados
+
+# Janelas da aba de qualidade do ar (horas até agora) e pontos máximos por série no gráfico
+AIR_QUALITY_WINDOWS = {"24 horas": 24, "72 horas": 72, "5 dias": 120}
+AIR_QUALITY_MAX_POINTS = int(os.getenv("AIR_QUALITY_MAX_POINTS", "72"))
+
+# Laudos exibidos por página na listagem de laudos armazenados
+REPORTS_PAGE_SIZE = 20
+PDF_READ_CHUNK_SIZE = 64 * 1024
+
+# Períodos disponíveis para a análise de eventos extremos
+EXTREME_EVENT_PERIODS = {"30 dias": 30, "90 dias": 90, "1 ano": 365}
+
+# Resolução (graus) da grade usada para agrupar coordenadas antes do cache
+COORD_SNAP_DEGREES = float(os.getenv("COORD_SNAP_DEGREES", "0.05"))
 
 
 # --- CONFIGURAÇÃO DA PÁGINA E ESTILOS ---
@@ -201,19 +297,529 @@ WEATHER_ICONS = {
 }
 
 
+# Widgets das visões que mantêm o valor enquanto outra visão está aberta
+# (o Streamlit descarta o estado de widgets que deixam de ser exibidos)
+PERSISTENT_VIEW_KEYS = ["extreme_events_period", "hourly_feels_like_toggle_temp_chart", "air_quality_window"]
+
+
+# Limiares padrão para detecção de eventos extremos
+EXTREME_EVENT_THRESHOLDS = {
+    'precipitation': 50,  # mm/dia
+    'wind_speed': 60,     # km/h
+    'heat_wave': 35,      # °C máxima por 3+ dias
+    'cold_wave': 5,       # °C mínima por 3+ dias
+    'wave_days': 3        # dias consecutivos que caracterizam uma onda
+}
+
+# Ajustes regionais sobre os limiares padrão (chave: país ou estado/admin1)
+REGIONAL_EVENT_THRESHOLDS = {
+    "Rio Grande do Sul": {'cold_wave': 2},
+    "Santa Catarina": {'cold_wave': 2},
+    "Paraná": {'cold_wave': 3},
+    "Amazonas": {'heat_wave': 37, 'precipitation': 80},
+    "Pará": {'heat_wave': 37, 'precipitation': 80},
+    "Piauí": {'heat_wave': 39},
+    "Mato Grosso": {'heat_wave': 38},
+}
+
+
+# Índice de Qualidade do Ar (metodologia AQI da US EPA). Para cada variável da
+# Open-Meteo: horas da média móvel regulatória, massa molar para converter
+# µg/m³ em ppb (None = breakpoints em µg/m³), divisor para ppm, casas decimais
+# de truncamento e breakpoints (C_baixo, C_alto, I_baixo, I_alto).
+AQI_POLLUTANTS = {
+    "pm2_5": {"label": "PM2.5", "hours": 24, "molar_mass": None, "divisor": 1, "decimals": 1, "breakpoints": [
+        (0.0, 9.0, 0, 50), (9.1, 35.4, 51, 100), (35.5, 55.4, 101, 150),
+        (55.5, 125.4, 151, 200), (125.5, 225.4, 201, 300), (225.5, 325.4, 301, 500)]},
+    "pm10": {"label": "PM10", "hours": 24, "molar_mass": None, "divisor": 1, "decimals": 0, "breakpoints": [
+        (0, 54, 0, 50), (55, 154, 51, 100), (155, 254, 101, 150),
+        (255, 354, 151, 200), (355, 424, 201, 300), (425, 604, 301, 500)]},
+    "ozone": {"label": "O₃", "hours": 8, "molar_mass": 48.00, "divisor": 1000, "decimals": 3, "breakpoints": [
+        (0.000, 0.054, 0, 50), (0.055, 0.070, 51, 100), (0.071, 0.085, 101, 150),
+        (0.086, 0.105, 151, 200), (0.106, 0.200, 201, 300)]},
+    "carbon_monoxide": {"label": "CO", "hours": 8, "molar_mass": 28.01, "divisor": 1000, "decimals": 1, "breakpoints": [
+        (0.0, 4.4, 0, 50), (4.5, 9.4, 51, 100), (9.5, 12.4, 101, 150),
+        (12.5, 15.4, 151, 200), (15.5, 30.4, 201, 300), (30.5, 50.4, 301, 500)]},
+    "nitrogen_dioxide": {"label": "NO₂", "hours": 1, "molar_mass": 46.01, "divisor": 1, "decimals": 0, "breakpoints": [
+        (0, 53, 0, 50), (54, 100, 51, 100), (101, 360, 101, 150),
+        (361, 649, 151, 200), (650, 1249, 201, 300), (1250, 2049, 301, 500)]},
+    "sulphur_dioxide": {"label": "SO₂", "hours": 1, "molar_mass": 64.07, "divisor": 1, "decimals": 0, "breakpoints": [
+        (0, 35, 0, 50), (36, 75, 51, 100), (76, 185, 101, 150),
+        (186, 304, 151, 200), (305, 604, 201, 300), (605, 1004, 301, 500)]},
+}
+AQI_MOLAR_VOLUME = 24.45  # L/mol a 25 °C e 1 atm
+AQI_CATEGORIES = [  # (IQA máximo, categoria, cor)
+    (50, "Boa", "#00e400"),
+    (100, "Moderada", "#ffff00"),
+    (150, "Insalubre para grupos sensíveis", "#ff7e00"),
+    (200, "Insalubre", "#ff0000"),
+    (300, "Muito insalubre", "#8f3f97"),
+    (500, "Perigosa", "#7e0023"),
+]
+AQI_ALERT_THRESHOLD = 100  # IQA acima do qual a aba de qualidade do ar exibe alerta
+
+
+@st.cache_resource  # Estrutura e migração verificadas uma vez por processo
 def init_db():
-    conn = sqlite3.connect('weather_reports.db')
-    c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS reports
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  city TEXT,
-                  date TEXT,
-                  event_date TEXT,
-                  report_type TEXT,
-                  pdf_content BLOB,
-                  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
-    conn.commit()
-    conn.close()
+    with reports_connection() as conn:
+        c = conn.cursor()
+        c.execute('''CREATE TABLE IF NOT EXISTS reports
+                     (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                      city TEXT,
+                      date TEXT,
+                      event_date TEXT,
+                      report_type TEXT,
+                      pdf_content BLOB,
+                      created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                      pdf_sha256 TEXT)''')
+        # PDFs ficam num armazenamento à parte, endereçado pelo SHA-256 do conteúdo
+        c.execute('''CREATE TABLE IF NOT EXISTS report_blobs
+                     (id INTEGER PRIMARY KEY,
+                      sha256 TEXT UNIQUE,
+                      compression TEXT,
+                      size INTEGER,
+                      data BLOB)''')
+        if "pdf_sha256" not in {row[1] for row in c.execute("PRAGMA table_info(reports)")}:
+            c.execute("ALTER TABLE reports ADD COLUMN pdf_sha256 TEXT")
+        # Índices para a listagem por data de criação e para os filtros
+        c.execute("CREATE INDEX IF NOT EXISTS idx_reports_created_at ON reports (created_at, id)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_reports_city_created_at ON reports (city, created_at, id)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_reports_type_created_at ON reports (report_type, created_at, id)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_reports_event_date ON reports (event_date)")
+        # Fila persistente de geração de laudos
+        c.execute('''CREATE TABLE IF NOT EXISTS report_jobs
+                     (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                      city TEXT,
+                      payload TEXT,
+                      status TEXT DEFAULT 'queued',
+                      total INTEGER,
+                      completed INTEGER DEFAULT 0,
+                      report_ids TEXT DEFAULT '[]',
+                      error TEXT,
+                      created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                      updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+        c.execute("CREATE INDEX IF NOT EXISTS idx_report_jobs_status ON report_jobs (status, id)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_report_jobs_city ON report_jobs (city, id)")
+        conn.commit()
+        migrate_inline_pdfs(conn)
+
+
+def store_pdf_blob(conn, pdf_content):
+    """Grava o PDF no armazenamento de blobs e retorna seu SHA-256.
+
+    PDFs idênticos são gravados uma única vez; o conteúdo é comprimido com
+    zlib quando isso reduz o tamanho.
+    """
+    digest = hashlib.sha256(pdf_content).hexdigest()
+    if conn.execute("SELECT 1 FROM report_blobs WHERE sha256=?", (digest,)).fetchone() is None:
+        compressed = zlib.compress(pdf_content, 6)
+        compression, data = ("zlib", compressed) if len(compressed) < len(pdf_content) else ("none", pdf_content)
+        conn.execute("INSERT OR IGNORE INTO report_blobs (sha256, compression, size, data) VALUES (?, ?, ?, ?)",
+                     (digest, compression, len(pdf_content), data))
+    return digest
+
+
+def migrate_inline_pdfs(conn, batch_size=100):
+    """Move os PDFs gravados na própria tabela `reports` para o armazenamento de blobs."""
+    migrated, last_id = 0, 0
+    while True:
+        rows = conn.execute("SELECT id, pdf_content FROM reports WHERE id > ? AND pdf_sha256 IS NULL "
+                            "AND pdf_content IS NOT NULL ORDER BY id LIMIT ?", (last_id, batch_size)).fetchall()
+        if not rows:
+            break
+        for report_id, pdf_content in rows:
+            digest = store_pdf_blob(conn, bytes(pdf_content))
+            conn.execute("UPDATE reports SET pdf_sha256=?, pdf_content=NULL WHERE id=?", (digest, report_id))
+        conn.commit()
+        migrated += len(rows)
+        last_id = rows[-1][0]
+    if migrated:
+        # Devolve ao sistema o espaço liberado pelos BLOBs removidos da tabela
+        conn.execute("VACUUM")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return migrated
+
+
+class JitteredRetry(Retry):
+    """Retry com backoff exponencial e jitter aleatório (evita rajadas sincronizadas)."""
+
+    def get_backoff_time(self):
+        backoff = super().get_backoff_time()
+        return random.uniform(0, backoff) if backoff > 0 else 0
+
+
+@st.cache_resource
+def get_http_session():
+    """Sessão HTTP compartilhada: pool de conexões por host, keep-alive, retries e gzip."""
+    retry = JitteredRetry(
+        total=HTTP_MAX_RETRIES,
+        backoff_factor=HTTP_BACKOFF_FACTOR,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({"GET"}),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"Accept-Encoding": "gzip, deflate", "Connection": "keep-alive"})
+    return session
+
+
+def http_get(url, params=None, timeout=None, **kwargs):
+    """Executa um GET pela sessão compartilhada com timeouts de conexão e leitura."""
+    if timeout is None:
+        timeout = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+    return get_http_session().get(url, params=params, timeout=timeout, **kwargs)
+
+
+class SQLitePool:
+    """Conexões SQLite com um banco, compartilhadas pelas threads do processo.
+
+    Mantém no máximo `size` conexões abertas, em modo WAL e criadas sob
+    demanda. `connection()` empresta uma delas e a devolve ao final; quem
+    chega com todas em uso espera até que uma seja devolvida.
+    """
+
+    def __init__(self, db_path, size):
+        self.db_path = db_path
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._idle = []
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-16000")  # ~16 MB de cache de páginas
+        conn.execute("PRAGMA mmap_size=134217728")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        with self._slots:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                conn = self._connect()
+            try:
+                yield conn
+            finally:
+                if conn.in_transaction:  # transação deixada aberta por uma exceção
+                    conn.rollback()
+                with self._lock:
+                    self._idle.append(conn)
+
+
+@st.cache_resource
+def get_sqlite_pool(db_path):
+    """Pool único (por processo) de conexões com o banco `db_path`."""
+    return SQLitePool(db_path, SQLITE_POOL_SIZE)
+
+
+def sqlite_connection(db_path):
+    """Empresta uma conexão do pool do banco, para uso com `with`."""
+    return get_sqlite_pool(db_path).connection()
+
+
+class CacheStats:
+    """Contadores de cache por fonte de dados, compartilhados por todas as sessões."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+
+    def record(self, namespace, event, amount=1):
+        with self._lock:
+            key = (namespace, event)
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def get(self, namespace, event):
+        with self._lock:
+            return self._counters.get((namespace, event), 0)
+
+    def namespaces(self):
+        with self._lock:
+            return sorted({namespace for namespace, _ in self._counters})
+
+    def hit_ratio(self, namespace):
+        """Fração das requisições atendidas pelo cache em memória (st.cache_data)."""
+        requests_count = self.get(namespace, "request")
+        if not requests_count:
+            return None
+        return 1 - self.get(namespace, "miss") / requests_count
+
+
+@st.cache_resource
+def get_cache_stats():
+    """Instância única dos contadores de cache."""
+    return CacheStats()
+
+
+class SingleFlight:
+    """Agrupa chamadas concorrentes com a mesma chave numa única execução.
+
+    A primeira chamada executa a função; as que chegam enquanto ela está em
+    andamento aguardam e recebem o mesmo resultado (ou a mesma exceção).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func, *args, **kwargs):
+        """Retorna (resultado, compartilhado), onde `compartilhado` indica carona."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Future()
+        if not leader:
+            return call.result(), True
+        try:
+            result = func(*args, **kwargs)
+        except BaseException as exc:
+            call.set_exception(exc)
+            raise
+        else:
+            call.set_result(result)
+            return result, False
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+
+@st.cache_resource
+def get_single_flight():
+    """Instância única do agrupador de requisições em andamento."""
+    return SingleFlight()
+
+
+class FigureCache:
+    """Cache LRU dos gráficos Plotly serializados em JSON, compartilhado pelas sessões.
+
+    Num acerto o gráfico é recriado do JSON sem nova validação (o spec já foi
+    validado ao ser montado), em vez de ser montado de novo a partir dos dados.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._specs = OrderedDict()
+
+    def get_or_build(self, key, build):
+        namespace = f"gráfico:{key[0]}"
+        stats = get_cache_stats()
+        stats.record(namespace, "request")
+        with self._lock:
+            spec = self._specs.get(key)
+            if spec is not None:
+                self._specs.move_to_end(key)
+        if spec is None:
+            stats.record(namespace, "miss")
+            started = time.perf_counter()
+            spec = build().to_json()
+            stats.record(namespace, "build_ms", (time.perf_counter() - started) * 1000)
+            with self._lock:
+                self._specs[key] = spec
+                while len(self._specs) > self.max_entries:
+                    self._specs.popitem(last=False)
+        return go.Figure(json.loads(spec), _validate=False)
+
+
+@st.cache_resource
+def get_figure_cache():
+    """Instância única do cache de gráficos."""
+    return FigureCache(FIGURE_CACHE_MAX_ENTRIES)
+
+
+def cached_figure(view, latitude, longitude, version, build, **options):
+    """Gráfico da visão para a localização e versão dos dados; `build()` só roda num miss.
+
+    `options` são as escolhas de exibição que mudam o gráfico (dia, toggles...).
+    """
+    latitude, longitude = snap_coordinates(latitude, longitude)
+    key = (view, latitude, longitude, version, tuple(sorted(options.items())))
+    return get_figure_cache().get_or_build(key, build)
+
+
+def snap_coordinates(latitude, longitude, precision=None):
+    """Ajusta as coordenadas ao centro da célula de grade que as contém.
+
+    Usuários próximos (por exemplo, via geolocalização) passam a compartilhar
+    a mesma chave de cache e a mesma requisição à API.
+    """
+    precision = COORD_SNAP_DEGREES if precision is None else precision
+    if not precision:
+        return latitude, longitude
+    snapped_lat = (math.floor(latitude / precision) + 0.5) * precision
+    snapped_lon = (math.floor(longitude / precision) + 0.5) * precision
+    return round(snapped_lat, 6), round(snapped_lon, 6)
+
+
+def make_cache_key(url, params=None):
+    """Gera uma chave estável a partir da URL e dos parâmetros normalizados."""
+    normalized = {}
+    for key, value in (params or {}).items():
+        if isinstance(value, (list, tuple)):
+            value = ",".join(str(v) for v in value)
+        elif isinstance(value, float):
+            value = round(value, 6)
+        normalized[key] = str(value)
+    payload = json.dumps([url, normalized], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Cache persistente de respostas das APIs externas em SQLite.
+
+    Os corpos são gravados comprimidos junto com o instante da gravação; o
+    tamanho total é limitado a `max_bytes`, descartando primeiro as entradas
+    acessadas há mais tempo (LRU).
+    """
+
+    def __init__(self, db_path, max_bytes):
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self._revalidating = set()
+        self._lock = threading.Lock()
+        with sqlite_connection(db_path) as conn:
+            conn.execute('''CREATE TABLE IF NOT EXISTS response_cache
+                            (cache_key TEXT PRIMARY KEY,
+                             namespace TEXT,
+                             body BLOB,
+                             size INTEGER,
+                             stored_at REAL,
+                             last_access REAL)''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_response_cache_last_access ON response_cache (last_access)")
+            conn.commit()
+
+    def get(self, key):
+        """Retorna (corpo, stored_at) ou None se a chave não estiver no cache."""
+        with sqlite_connection(self.db_path) as conn:
+            row = conn.execute("SELECT body, stored_at FROM response_cache WHERE cache_key=?", (key,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE response_cache SET last_access=? WHERE cache_key=?", (time.time(), key))
+            conn.commit()
+            return zlib.decompress(row[0]).decode("utf-8"), row[1]
+
+    def set(self, key, namespace, body):
+        """Grava um corpo de resposta e aplica o limite de tamanho."""
+        data = zlib.compress(body.encode("utf-8"))
+        now = time.time()
+        with sqlite_connection(self.db_path) as conn:
+            conn.execute("INSERT OR REPLACE INTO response_cache VALUES (?, ?, ?, ?, ?, ?)",
+                         (key, namespace, data, len(data), now, now))
+            self._evict(conn)
+            conn.commit()
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM response_cache").fetchone()[0]
+        excess = total - self.max_bytes
+        if excess <= 0:
+            return
+        victims = []
+        for key, size in conn.execute("SELECT cache_key, size FROM response_cache ORDER BY last_access"):
+            victims.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        conn.executemany("DELETE FROM response_cache WHERE cache_key=?", victims)
+
+    def begin_revalidation(self, key):
+        """Marca a chave como em revalidação; retorna False se já houver uma em curso."""
+        with self._lock:
+            if key in self._revalidating:
+                return False
+            self._revalidating.add(key)
+            return True
+
+    def end_revalidation(self, key):
+        with self._lock:
+            self._revalidating.discard(key)
+
+
+@st.cache_resource
+def get_response_cache():
+    """Instância única do cache persistente de respostas."""
+    return ResponseCache(RESPONSE_CACHE_DB, RESPONSE_CACHE_MAX_BYTES)
+
+
+def _fetch_and_store(cache, namespace, key, url, params):
+    response = http_get(url, params=params)
+    response.raise_for_status()
+    cache.set(key, namespace, response.text)
+    return response.text
+
+
+def _fetch_coalesced(cache, namespace, key, url, params):
+    """Busca na origem garantindo uma única requisição em andamento por chave."""
+    body, shared = get_single_flight().do(key, _fetch_and_store, cache, namespace, key, url, params)
+    get_cache_stats().record(namespace, "coalesced" if shared else "upstream")
+    return body
+
+
+def _revalidate(cache, namespace, key, url, params):
+    try:
+        _fetch_coalesced(cache, namespace, key, url, params)
+    except requests.exceptions.RequestException:
+        pass  # Mantém a resposta vencida até a próxima tentativa
+    finally:
+        cache.end_revalidation(key)
+
+
+def cached_get_text(namespace, url, params=None, ttl=600):
+    """Executa um GET usando o cache persistente e retorna o corpo como texto.
+
+    Respostas dentro do `ttl` são servidas do disco. Depois dele, e por até
+    RESPONSE_CACHE_STALE_SECONDS, a resposta vencida é devolvida enquanto uma
+    nova cópia é buscada em segundo plano (stale-while-revalidate).
+    """
+    cache = get_response_cache()
+    key = make_cache_key(url, params)
+    entry = cache.get(key)
+    if entry is not None:
+        body, stored_at = entry
+        age = time.time() - stored_at
+        if age < ttl:
+            get_cache_stats().record(namespace, "disk_hit")
+            return body
+        if age < ttl + RESPONSE_CACHE_STALE_SECONDS:
+            get_cache_stats().record(namespace, "disk_stale")
+            if cache.begin_revalidation(key):
+                get_fetch_executor().submit(_revalidate, cache, namespace, key, url, params)
+            return body
+    return _fetch_coalesced(cache, namespace, key, url, params)
+
+
+def _body_version(body):
+    """Hash curto do corpo de uma resposta, usado como versão dos dados."""
+    return hashlib.blake2b(body.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def _versioned_json(body):
+    """Decodifica uma resposta JSON anotando sua versão na chave `_version`."""
+    data = json.loads(body)
+    data["_version"] = _body_version(body)
+    return data
+
+
+def data_version(data):
+    """Identificador curto do conteúdo de um conjunto de dados (para chaves de cache)."""
+    if data is None:
+        return None
+    if isinstance(data, pd.DataFrame):
+        if "version" in data.attrs:
+            return data.attrs["version"]
+        if data.empty:
+            return "empty"
+        return format(int(pd.util.hash_pandas_object(data, index=False).sum()) & 0xFFFFFFFFFFFFFFFF, "x")
+    if isinstance(data, dict) and "_version" in data:
+        return data["_version"]
+    return hashlib.blake2b(json.dumps(data, sort_keys=True, default=str).encode("utf-8"), digest_size=8).hexdigest()
 
 
 @st.cache_data(ttl=3600)  # Cache por 1 hora
@@ -221,7 +827,7 @@ def get_city_options(city_name):
     """Obtém opções de cidades a partir do nome pesquisado."""
     url = f"https://geocoding-api.open-meteo.com/v1/search?name={city_name.lower()}&count=20&language=pt"
     try:
-        response = requests.get(url)
+        response = http_get(url)
         response.raise_for_status()
         data = response.json()
         if data.get("results"):
@@ -233,9 +839,16 @@ def get_city_options(city_name):
         return []
 
 
-@st.cache_data(ttl=600)  # Cache por 10 minutos
 def get_weather_data(latitude, longitude, timezone="auto", forecast_days=16):
-    """Obtém dados meteorológicos para as coordenadas."""
+    """Obtém dados meteorológicos para as coordenadas (ajustadas à grade do cache)."""
+    latitude, longitude = snap_coordinates(latitude, longitude)
+    get_cache_stats().record("forecast", "request")
+    return _get_weather_data_cached(latitude, longitude, timezone, forecast_days)
+
+
+@st.cache_data(ttl=600)  # Cache por 10 minutos
+def _get_weather_data_cached(latitude, longitude, timezone, forecast_days):
+    get_cache_stats().record("forecast", "miss")
     url = "https://api.open-meteo.com/v1/forecast"
     params = {
         "latitude": latitude,
@@ -247,91 +860,587 @@ def get_weather_data(latitude, longitude, timezone="auto", forecast_days=16):
         "forecast_days": forecast_days
     }
     try:
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        return response.json()
+        return _versioned_json(cached_get_text("forecast", url, params, ttl=600))
     except requests.exceptions.RequestException as e:
         st.error(f"Erro ao obter dados meteorológicos: {str(e)}")
         return None
 
 
-@st.cache_data(ttl=3600)  # Cache por 1 hora
+def nearest_time_index(times, instants):
+    """Posições, em `times` (ordenado), da amostra mais próxima de cada instante.
+
+    Usa busca binária (searchsorted) em vez de ordenar as distâncias; em caso
+    de empate fica a amostra anterior. Com `times` vazio não há amostra a
+    apontar e o resultado é um array de posições vazio.
+    """
+    values = np.asarray(times, dtype="datetime64[ns]").astype(np.int64)
+    targets = np.atleast_1d(np.asarray(instants, dtype="datetime64[ns]")).astype(np.int64)
+    if len(values) == 0:
+        return np.empty(0, dtype=np.intp)
+    if len(values) == 1:
+        return np.zeros(len(targets), dtype=np.intp)
+    right = np.clip(np.searchsorted(values, targets), 1, len(values) - 1)
+    left = right - 1
+    return np.where(targets - values[left] <= values[right] - targets, left, right)
+
+
+class ForecastData:
+    """Previsão Open-Meteo em formato colunar, montada uma vez por resposta.
+
+    Os DataFrames `hourly` e `daily` só são criados no primeiro acesso e ficam
+    guardados no objeto: horários já convertidos, código de tempo categórico e
+    colunas `condition`/`icon` prontas. `raw` mantém o JSON original.
+    """
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.version = data_version(raw)
+        self.current = raw.get("current", {})
+
+    @staticmethod
+    def _frame(section, time_columns=()):
+        df = pd.DataFrame({name: values for name, values in section.items()})
+        df["time"] = pd.to_datetime(df["time"])
+        for name in time_columns:
+            if name in df.columns:
+                df[name] = pd.to_datetime(df[name])
+        if "weather_code" in df.columns:
+            codes = pd.Series(pd.array(df["weather_code"], dtype="Int16"), index=df.index).astype("category")
+            # As tabelas de rótulos/ícones são consultadas uma vez por código distinto, não por linha
+            categories = codes.cat.categories.tolist()
+            positions = codes.cat.codes.to_numpy()
+            df["weather_code"] = codes
+            df["condition"] = np.array([WEATHER_CODES.get(code, "Desconhecido") for code in categories] + ["Desconhecido"],
+                                       dtype=object)[positions]
+            df["icon"] = np.array([WEATHER_ICONS.get(code, "❓") for code in categories] + ["❓"], dtype=object)[positions]
+        return df
+
+    @cached_property
+    def hourly(self):
+        """Série horária (uma linha por hora, coluna `time` em datetime)."""
+        return self._frame(self.raw.get("hourly") or {"time": []})
+
+    @cached_property
+    def daily(self):
+        """Série diária, com `sunrise`/`sunset` em datetime."""
+        return self._frame(self.raw.get("daily") or {"time": []}, time_columns=("sunrise", "sunset"))
+
+    @cached_property
+    def day_index(self):
+        """Posição de cada data (datetime.date) na série diária."""
+        return {day: position for position, day in enumerate(self.daily["time"].dt.date)}
+
+    def daily_for(self, day):
+        """Linha diária de `day` (datetime.date), ou None se fora da previsão."""
+        position = self.day_index.get(day)
+        return None if position is None else self.daily.iloc[position]
+
+    def nearest_hourly(self, instants):
+        """Linhas horárias mais próximas de cada instante informado (nenhuma, sem dados horários)."""
+        return self.hourly.iloc[nearest_time_index(self.hourly["time"], instants)]
+
+
+@st.cache_resource(ttl=3600, max_entries=64)
+def _forecast_data_for_version(version, _raw):
+    return ForecastData(_raw)
+
+
+def get_forecast_data(weather_data):
+    """Modelo colunar da previsão, compartilhado entre abas e reruns da mesma resposta."""
+    if not weather_data:
+        return None
+    return _forecast_data_for_version(data_version(weather_data), weather_data)
+
+
 def get_historical_weather_data(latitude, longitude, start_date, end_date):
     """Obtém dados históricos para análise de eventos extremos."""
+    latitude, longitude = snap_coordinates(latitude, longitude)
+    get_cache_stats().record("archive", "request")
+    return _get_historical_weather_data_cached(latitude, longitude, start_date, end_date)
+
+
+@st.cache_data(ttl=3600)  # Cache por 1 hora
+def _get_historical_weather_data_cached(latitude, longitude, start_date, end_date):
+    get_cache_stats().record("archive", "miss")
     url = "https://archive-api.open-meteo.com/v1/archive"
     params = {
         "latitude": latitude,
         "longitude": longitude,
         "start_date": start_date,
         "end_date": end_date,
-        "daily": [
-            "temperature_2m_max", "temperature_2m_min", "precipitation_sum",
-            "wind_speed_10m_max", "wind_direction_10m_dominant"
-        ],
+        "daily": HISTORY_DAILY_VARIABLES,
         "timezone": "auto"
     }
     try:
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        return response.json()
+        return _versioned_json(cached_get_text("archive", url, params, ttl=3600))
     except requests.exceptions.RequestException as e:
         st.error(f"Erro ao obter dados históricos: {str(e)}")
         return None
 
 
+class HistoryStore:
+    """Arquivo local das séries diárias históricas por localização (SQLite).
+
+    Guarda apenas dias consolidados (mais antigos que ARCHIVE_SETTLE_DAYS),
+    que não mudam mais na API de arquivo.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        columns = ", ".join(f"{name} REAL" for name in HISTORY_DAILY_VARIABLES)
+        with sqlite_connection(db_path) as conn:
+            conn.execute(f'''CREATE TABLE IF NOT EXISTS daily_history
+                            (location_key TEXT,
+                             date TEXT,
+                             {columns},
+                             PRIMARY KEY (location_key, date)) WITHOUT ROWID''')
+            conn.commit()
+
+    def stored_dates(self, location_key, start_date, end_date):
+        with sqlite_connection(self.db_path) as conn:
+            rows = conn.execute("SELECT date FROM daily_history WHERE location_key=? AND date BETWEEN ? AND ?",
+                                (location_key, start_date, end_date))
+            return {row[0] for row in rows}
+
+    def upsert(self, location_key, daily, last_date):
+        """Grava os dias até `last_date` que tenham ao menos um valor preenchido."""
+        rows = []
+        for i, day in enumerate(daily.get("time", [])):
+            if day > last_date:
+                continue
+            values = [(daily.get(name) or [None] * (i + 1))[i] for name in HISTORY_DAILY_VARIABLES]
+            if any(value is not None for value in values):
+                rows.append((location_key, day, *values))
+        placeholders = ", ".join("?" * (len(HISTORY_DAILY_VARIABLES) + 2))
+        with sqlite_connection(self.db_path) as conn:
+            conn.executemany(f"INSERT OR REPLACE INTO daily_history VALUES ({placeholders})", rows)
+            conn.commit()
+
+    def window(self, location_key, start_date, end_date):
+        """Retorna o período no formato `daily` da API Open-Meteo."""
+        with sqlite_connection(self.db_path) as conn:
+            rows = conn.execute(f"SELECT date, {', '.join(HISTORY_DAILY_VARIABLES)} FROM daily_history "
+                                "WHERE location_key=? AND date BETWEEN ? AND ? ORDER BY date",
+                                (location_key, start_date, end_date)).fetchall()
+        columns = list(zip(*rows)) if rows else [()] * (len(HISTORY_DAILY_VARIABLES) + 1)
+        daily = {"time": list(columns[0])}
+        for name, values in zip(HISTORY_DAILY_VARIABLES, columns[1:]):
+            daily[name] = list(values)
+        return daily
+
+
+@st.cache_resource
+def get_history_store():
+    """Instância única do arquivo histórico local."""
+    return HistoryStore(HISTORY_DB)
+
+
+def get_history_window(latitude, longitude, start_date, end_date):
+    """Obtém dados históricos diários servindo o máximo possível do arquivo local.
+
+    Só o intervalo de dias consolidados que ainda falta no arquivo é buscado
+    na API (e então gravado); os dias recentes, ainda sujeitos a revisão, são
+    sempre buscados. Retorna None se alguma busca necessária falhar.
+    """
+    latitude, longitude = snap_coordinates(latitude, longitude)
+    location_key = f"{latitude:.6f},{longitude:.6f}"
+    store = get_history_store()
+    settled_end = min(end_date, (date.today() - timedelta(days=ARCHIVE_SETTLE_DAYS)).isoformat())
+
+    if start_date <= settled_end:
+        stored = store.stored_dates(location_key, start_date, settled_end)
+        first_day = date.fromisoformat(start_date)
+        total_days = (date.fromisoformat(settled_end) - first_day).days + 1
+        missing = [d for d in (first_day + timedelta(days=i) for i in range(total_days)) if d.isoformat() not in stored]
+        if missing:
+            # Um único intervalo cobrindo as lacunas: uma requisição por visita
+            data = get_historical_weather_data(latitude, longitude, missing[0].isoformat(), missing[-1].isoformat())
+            if not data:
+                return None
+            store.upsert(location_key, data.get("daily", {}), settled_end)
+        daily = store.window(location_key, start_date, settled_end)
+    else:
+        daily = store.window(location_key, "", "")
+
+    if end_date > settled_end:
+        recent_start = max(start_date, (date.fromisoformat(settled_end) + timedelta(days=1)).isoformat())
+        recent = get_historical_weather_data(latitude, longitude, recent_start, end_date)
+        if not recent:
+            return None
+        recent_daily = recent.get("daily", {})
+        for name in ["time"] + HISTORY_DAILY_VARIABLES:
+            daily[name] = daily[name] + list(recent_daily.get(name) or [None] * len(recent_daily.get("time", [])))
+    return {"daily": daily}
+
+
+def get_air_quality_data(latitude, longitude, window_hours=24):
+    """Obtém dados de qualidade do ar para as coordenadas (Open-Meteo Air Quality).
+
+    Pede à API só os dias que cobrem as últimas `window_hours` horas (mais um
+    dia para as médias do IQA) e o dia corrente, em vez dos 5 dias de
+    previsão padrão.
+    """
+    latitude, longitude = snap_coordinates(latitude, longitude)
+    get_cache_stats().record("air_quality", "request")
+    # Um dia a mais para as médias móveis de 24 h do IQA no início da janela
+    return _get_air_quality_data_cached(latitude, longitude, math.ceil(window_hours / 24) + 1, 1)
+
+
 @st.cache_data(ttl=3600)  # Cache por 1 hora
-def get_air_quality_data(latitude, longitude):
-    """Obtém dados de qualidade do ar para as coordenadas (Open-Meteo Air Quality)."""
+def _get_air_quality_data_cached(latitude, longitude, past_days, forecast_days):
+    get_cache_stats().record("air_quality", "miss")
     url = "https://air-quality-api.open-meteo.com/v1/air-quality"
     params = {
         "latitude": latitude,
         "longitude": longitude,
         "hourly": "pm10,pm2_5,carbon_monoxide,nitrogen_dioxide,sulphur_dioxide,ozone",
+        "past_days": past_days,
+        "forecast_days": forecast_days,
         "timezone": "auto"
     }
     try:
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        return response.json()
+        return _versioned_json(cached_get_text("air_quality", url, params, ttl=3600))
     except requests.exceptions.RequestException as e:
         st.warning(f"Não foi possível obter dados de qualidade do ar: {str(e)}")
         return None
 
 
-def detect_extreme_events(weather_data):
-    """Identifica eventos climáticos extremos nos dados."""
-    extreme_events = []
-    threshold = {
-        'precipitation': 50,  # mm/dia
-        'wind_speed': 60,     # km/h
-        'heat_wave': 35,      # °C máxima por 3+ dias
-        'cold_wave': 5        # °C mínima por 3+ dias
+def _aqi_subindex(concentration, breakpoints):
+    """Subíndice por interpolação linear nos breakpoints (acima da escala vale 500)."""
+    c_low, c_high, i_low, i_high = np.asarray(breakpoints, dtype=float).T
+    position = np.searchsorted(c_high, concentration, side="left")
+    above_scale = position >= len(c_high)
+    position = np.minimum(position, len(c_high) - 1)
+    index = (i_high[position] - i_low[position]) / (c_high[position] - c_low[position]) \
+        * (concentration - c_low[position]) + i_low[position]
+    index = np.where(above_scale, 500.0, index)
+    return np.where(np.isnan(concentration), np.nan, np.round(index))
+
+
+def compute_aqi(aq_data):
+    """IQA horário (AQI da US EPA) a partir da série horária da Open-Meteo.
+
+    Para cada poluente calcula a média móvel regulatória (24 h para PM, 8 h
+    para O₃ e CO, 1 h para NO₂ e SO₂, exigindo 75% das horas), converte
+    µg/m³ para ppb/ppm quando o padrão pede, trunca e interpola nos
+    breakpoints, sempre sobre a série inteira. Retorna um DataFrame por hora
+    com os subíndices (`aqi_<variável>`), o IQA geral (`aqi`), o poluente
+    dominante e a categoria com sua cor.
+    """
+    hourly = aq_data.get("hourly") or {}
+    times = pd.to_datetime(hourly.get("time", []))
+    result = pd.DataFrame({"time": times})
+    subindices = []
+    for name, spec in AQI_POLLUTANTS.items():
+        values = hourly.get(name)
+        series = pd.Series(values if values is not None else np.nan, index=result.index, dtype=float)
+        averaged = series.rolling(spec["hours"], min_periods=math.ceil(spec["hours"] * 0.75)).mean().to_numpy()
+        if spec["molar_mass"]:
+            averaged = averaged * AQI_MOLAR_VOLUME / spec["molar_mass"] / spec["divisor"]
+        scale = 10 ** spec["decimals"]
+        truncated = np.floor(np.clip(averaged, 0, None) * scale + 1e-9) / scale
+        result[f"aqi_{name}"] = _aqi_subindex(truncated, spec["breakpoints"])
+        subindices.append(result[f"aqi_{name}"].to_numpy())
+
+    matrix = np.column_stack(subindices) if len(result) else np.empty((0, len(AQI_POLLUTANTS)))
+    filled = np.where(np.isnan(matrix), -1.0, matrix)
+    dominant = filled.argmax(axis=1)
+    aqi = filled.max(axis=1)
+    valid = aqi >= 0
+    labels = np.array([spec["label"] for spec in AQI_POLLUTANTS.values()], dtype=object)
+    category = np.searchsorted([limit for limit, _, _ in AQI_CATEGORIES[:-1]], aqi, side="left")
+    result["aqi"] = np.where(valid, aqi, np.nan)
+    result["dominant"] = np.where(valid, labels[dominant], None)
+    result["category"] = np.where(valid, np.array([label for _, label, _ in AQI_CATEGORIES], dtype=object)[category], None)
+    result["color"] = np.where(valid, np.array([color for _, _, color in AQI_CATEGORIES], dtype=object)[category], None)
+    return result
+
+
+@st.cache_data(ttl=3600, max_entries=256)
+def get_aqi_frame(air_quality_version, _aq_data):
+    """IQA horário de uma resposta de qualidade do ar (cacheado pela versão da resposta)."""
+    return compute_aqi(_aq_data)
+
+
+def air_quality_now(aq_data):
+    """Hora local atual (cheia) da localização da resposta de qualidade do ar."""
+    now = pd.Timestamp.now(tz="UTC").tz_localize(None) + pd.Timedelta(seconds=aq_data.get("utc_offset_seconds", 0))
+    return now.floor("h")
+
+
+def current_aqi(aq_data):
+    """Linha do IQA da hora atual (a mais recente com valor até agora), ou None."""
+    aqi_df = get_aqi_frame(data_version(aq_data), aq_data)
+    past = aqi_df[(aqi_df["time"] <= air_quality_now(aq_data)) & aqi_df["aqi"].notna()]
+    return None if past.empty else past.iloc[-1]
+
+
+@st.cache_resource
+def get_fetch_executor():
+    """Pool de threads compartilhado pelas requisições às APIs externas."""
+    return ThreadPoolExecutor(max_workers=16, thread_name_prefix="upstream")
+
+
+def _run_with_script_ctx(ctx, func, *args, **kwargs):
+    """Executa `func` numa thread do pool vinculada à sessão Streamlit de origem.
+
+    O contexto é removido ao final, para que a próxima tarefa da mesma thread
+    (de outra sessão, uma revalidação ou um prefetch) não escreva nesta página.
+    """
+    thread = threading.current_thread()
+    previous = getattr(thread, SCRIPT_RUN_CONTEXT_ATTR_NAME, None)
+    add_script_run_ctx(thread, ctx)
+    try:
+        return func(*args, **kwargs)
+    finally:
+        if previous is None:
+            if hasattr(thread, SCRIPT_RUN_CONTEXT_ATTR_NAME):
+                delattr(thread, SCRIPT_RUN_CONTEXT_ATTR_NAME)
+        else:
+            setattr(thread, SCRIPT_RUN_CONTEXT_ATTR_NAME, previous)
+
+
+class LocationFetch:
+    """Busca concorrente dos dados de uma localização.
+
+    A previsão e as fontes em `sources` (as que a visão ativa exibe) são
+    solicitadas ao mesmo tempo, vinculadas à sessão; cada uma é consultada com
+    `result`, que respeita o timeout da fonte (contado a partir do disparo) e
+    devolve `default` se ela não responder a tempo. Assim a aba "Atual" pode
+    ser exibida assim que a previsão chega, sem esperar pela NASA FIRMS. As
+    demais fontes só aquecem os caches em segundo plano (ver `prefetch`).
+    """
+
+    SOURCE_LABELS = {
+        "weather": "previsão do tempo",
+        "fire": "focos de incêndio",
+        "air_quality": "qualidade do ar",
+    }
+
+    def __init__(self, latitude, longitude, sources=()):
+        self.started_at = time.monotonic()
+        ctx = get_script_run_ctx()
+        executor = get_fetch_executor()
+        fetchers = {
+            "weather": get_weather_data,
+            "fire": get_fire_data,
+            "air_quality": get_air_quality_data,
+        }
+        self.futures = {}
+        self.prefetches = {}
+        for source, func in fetchers.items():
+            if source == "weather" or source in sources:
+                self.futures[source] = executor.submit(_run_with_script_ctx, ctx, func, latitude, longitude)
+            else:
+                self.prefetch(source, func, latitude, longitude)
+
+    def result(self, source, default=None):
+        """Aguarda o resultado de uma fonte vinculada até o fim do seu timeout."""
+        remaining = UPSTREAM_TIMEOUTS[source] - (time.monotonic() - self.started_at)
+        try:
+            return self.futures[source].result(timeout=max(remaining, 0))
+        except FutureTimeoutError:
+            st.warning(f"Tempo esgotado ao obter dados de {self.SOURCE_LABELS[source]}.")
+            return default
+        except Exception as e:
+            st.error(f"Erro ao obter dados de {self.SOURCE_LABELS[source]}: {str(e)}")
+            return default
+
+    def settle(self):
+        """Aguarda (até os timeouts) as buscas vinculadas à sessão que ninguém consultou.
+
+        Chamado no fim da execução do script, para que nenhuma dessas threads
+        escreva na página depois que a execução terminou. Só a visão ativa tem
+        buscas vinculadas, então normalmente não há o que esperar; as buscas
+        de `prefetch` nunca são aguardadas.
+        """
+        for source, future in self.futures.items():
+            remaining = UPSTREAM_TIMEOUTS[source] - (time.monotonic() - self.started_at)
+            try:
+                future.result(timeout=max(remaining, 0))
+            except Exception:
+                pass
+
+    def prefetch(self, source, func, *args):
+        """Dispara em segundo plano uma busca cujo resultado só aquece os caches.
+
+        Usada para as fontes que a visão ativa não exibe; roda sem contexto de
+        sessão, então avisos e erros não aparecem na página.
+        """
+        if source not in self.futures and source not in self.prefetches:
+            self.prefetches[source] = get_fetch_executor().submit(func, *args)
+
+
+def view_sources(view):
+    """Fontes da LocationFetch, além da previsão, que `view` exibe nesta execução."""
+    if view == "⏱️ Atual":
+        return ("fire", "air_quality")
+    if view == "🔥 Focos de Incêndio":
+        return ("fire",)
+    if view == "🌬️ Qualidade do Ar":
+        window_label = st.session_state.get("air_quality_window", next(iter(AIR_QUALITY_WINDOWS)))
+        # Janelas acima de 24 h são buscadas pela própria visão
+        return ("air_quality",) if AIR_QUALITY_WINDOWS.get(window_label, 24) <= 24 else ()
+    return ()
+
+
+def get_event_thresholds(city_data=None):
+    """Retorna os limiares de eventos extremos para a região da cidade.
+
+    Os ajustes do país são aplicados antes dos do estado (admin1).
+    """
+    thresholds = dict(EXTREME_EVENT_THRESHOLDS)
+    if city_data:
+        for region in (city_data.get('country_code'), city_data.get('country'), city_data.get('admin1')):
+            thresholds.update(REGIONAL_EVENT_THRESHOLDS.get(region, {}))
+    return thresholds
+
+
+def _daily_array(daily_data, key, length):
+    """Converte uma série diária em array float, tratando ausências como 0."""
+    values = daily_data.get(key)
+    if values is None:
+        return np.zeros(length)
+    return np.nan_to_num(np.asarray(values, dtype=float), nan=0.0)
+
+
+def _consecutive_days(mask, days):
+    """Marca os dias que encerram uma sequência de `days` dias com `mask` verdadeira."""
+    if days <= 1:
+        return mask.copy()
+    counts = np.cumsum(mask, dtype=np.int64)
+    window = counts.copy()
+    window[days:] -= counts[:-days]
+    return window >= days
+
+
+def _extreme_event_masks(daily_data, thresholds, length):
+    """Avalia todas as regras de eventos extremos de uma vez sobre as séries diárias."""
+    wave_days = thresholds.get('wave_days', 3)
+    return {
+        'precipitation': _daily_array(daily_data, 'precipitation_sum', length) > thresholds['precipitation'],
+        'wind_speed': _daily_array(daily_data, 'wind_speed_10m_max', length) > thresholds['wind_speed'],
+        'heat_wave': _consecutive_days(_daily_array(daily_data, 'temperature_2m_max', length) >= thresholds['heat_wave'], wave_days),
+        'cold_wave': _consecutive_days(_daily_array(daily_data, 'temperature_2m_min', length) <= thresholds['cold_wave'], wave_days),
     }
+
+
+def detect_extreme_events(weather_data, thresholds=None):
+    """Identifica eventos climáticos extremos nos dados.
+
+    As regras são avaliadas de forma vetorizada (NumPy); apenas os dias com
+    algum evento são percorridos para montar as descrições.
+    """
+    thresholds = thresholds or EXTREME_EVENT_THRESHOLDS
     daily_data = weather_data.get('daily', {})
     dates = daily_data.get('time', [])
+    length = len(dates)
+    if not length:
+        return []
 
-    for i in range(len(dates)):
-        event = {'date': dates[i], 'events': []}
-        precip_value = daily_data.get('precipitation_sum', [0] * len(dates))[i] or 0
-        if precip_value > threshold['precipitation']:
-            event['events'].append(f"Precipitação extrema: {precip_value} mm")
-
-        wind_value = daily_data.get('wind_speed_10m_max', [0] * len(dates))[i] or 0
-        if wind_value > threshold['wind_speed']:
-            direction = daily_data.get('wind_direction_10m_dominant', [0] * len(dates))[i]
-            event['events'].append(f"Rajada de vento: {wind_value} km/h, direção {direction}°")
-
-        if i >= 2:
-            if all((daily_data.get('temperature_2m_max', [0] * len(dates))[j] or 0) >= threshold['heat_wave'] for j in range(i - 2, i + 1)):
-                event['events'].append("Onda de calor detectada")
-            if all((daily_data.get('temperature_2m_min', [0] * len(dates))[j] or 0) <= threshold['cold_wave'] for j in range(i - 2, i + 1)):
-                event['events'].append("Onda de frio detectada")
-
-        if event['events']:
-            extreme_events.append(event)
+    masks = _extreme_event_masks(daily_data, thresholds, length)
+    event_days = np.flatnonzero(masks['precipitation'] | masks['wind_speed'] | masks['heat_wave'] | masks['cold_wave'])
+
+    precipitation = daily_data.get('precipitation_sum')
+    wind_speed = daily_data.get('wind_speed_10m_max')
+    wind_direction = daily_data.get('wind_direction_10m_dominant')
+    extreme_events = []
+    for i in event_days.tolist():
+        events = []
+        if masks['precipitation'][i]:
+            events.append(f"Precipitação extrema: {precipitation[i]} mm")
+        if masks['wind_speed'][i]:
+            direction = wind_direction[i] if wind_direction is not None else 0
+            events.append(f"Rajada de vento: {wind_speed[i]} km/h, direção {direction}°")
+        if masks['heat_wave'][i]:
+            events.append("Onda de calor detectada")
+        if masks['cold_wave'][i]:
+            events.append("Onda de frio detectada")
+        extreme_events.append({'date': dates[i], 'events': events})
     return extreme_events
 
 
+# Rótulos, séries de origem e unidades de cada tipo de evento
+EXTREME_EVENT_TYPES = {
+    'precipitation': ("Precipitação extrema", 'precipitation_sum', "mm"),
+    'wind_speed': ("Rajada de vento", 'wind_speed_10m_max', "km/h"),
+    'heat_wave': ("Onda de calor", 'temperature_2m_max', "°C"),
+    'cold_wave': ("Onda de frio", 'temperature_2m_min', "°C"),
+}
+
+
+def extreme_events_table(weather_data, thresholds=None):
+    """Retorna os eventos extremos em formato tabular (date, event_type, magnitude, unit).
+
+    A magnitude é o valor diário da série que disparou a regra (para ondas de
+    calor/frio, a máxima/mínima do dia que completa a sequência).
+    """
+    thresholds = thresholds or EXTREME_EVENT_THRESHOLDS
+    daily_data = weather_data.get('daily', {})
+    dates = np.asarray(daily_data.get('time', []))
+    columns = ["date", "event_type", "magnitude", "unit"]
+    if not len(dates):
+        return pd.DataFrame(columns=columns)
+
+    masks = _extreme_event_masks(daily_data, thresholds, len(dates))
+    frames = []
+    for rule, (label, series_key, unit) in EXTREME_EVENT_TYPES.items():
+        idx = np.flatnonzero(masks[rule])
+        if len(idx):
+            frames.append(pd.DataFrame({
+                "date": dates[idx],
+                "event_type": label,
+                "magnitude": _daily_array(daily_data, series_key, len(dates))[idx],
+                "unit": unit
+            }))
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(frames, ignore_index=True).sort_values("date", kind="stable", ignore_index=True)
+
+
+def scan_extreme_events(locations, start_date, end_date, max_workers=4):
+    """Varre eventos extremos de várias localidades num período.
+
+    `locations` é uma lista de dicts com `name`, `latitude` e `longitude`
+    (e opcionalmente `admin1`/`country_code` para os limiares regionais). Os
+    dados vêm do arquivo histórico local, buscando na API apenas o que falta,
+    com no máximo `max_workers` localidades processadas simultaneamente.
+    Retorna um único DataFrame com city, latitude, longitude, date,
+    event_type, magnitude e unit.
+
+    Uma localidade cuja busca falha não interrompe a varredura nem se confunde
+    com "nenhum evento": ela é listada em `attrs["failures"]` do resultado,
+    como dicts com city, latitude, longitude e error.
+    """
+    def scan(location):
+        try:
+            data = get_history_window(location["latitude"], location["longitude"], start_date, end_date)
+            if not data:
+                return None, "Não foi possível obter dados históricos para o período."
+            table = extreme_events_table(data, get_event_thresholds(location))
+        except Exception as e:
+            return None, f"{type(e).__name__}: {e}"
+        table.insert(0, "longitude", location["longitude"])
+        table.insert(0, "latitude", location["latitude"])
+        table.insert(0, "city", location["name"])
+        return table, None
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="event-scan") as executor:
+        results = list(executor.map(scan, locations))
+    frames = [table for table, _ in results if table is not None and not table.empty]
+    failures = [
+        {"city": location.get("name"), "latitude": location.get("latitude"),
+         "longitude": location.get("longitude"), "error": error}
+        for location, (_, error) in zip(locations, results) if error is not None
+    ]
+    if frames:
+        events = pd.concat(frames, ignore_index=True)
+    else:
+        events = pd.DataFrame(columns=["city", "latitude", "longitude", "date", "event_type", "magnitude", "unit"])
+    events.attrs["failures"] = failures
+    return events
+
+
 def get_satellite_images(latitude, longitude, date):
     """Obtém imagens de satélite próximas à data do evento (simulado para este exemplo)."""
     return {
@@ -341,9 +1450,127 @@ def get_satellite_images(latitude, longitude, date):
     }
 
 
-@st.cache_data(ttl=3600)
-def create_weather_map(latitude, longitude, city_name, weather_data=None, fire_data=None, air_quality_data=None):
-    """Cria um mapa meteorológico interativo com camadas."""
+def _point_feature(latitude, longitude, **properties):
+    return {
+        "type": "Feature",
+        "geometry": {"type": "Point", "coordinates": [longitude, latitude]},
+        "properties": properties
+    }
+
+
+def _feature_collection(features):
+    return {"type": "FeatureCollection", "features": features}
+
+
+@st.cache_data(ttl=3600, max_entries=256)
+def build_temperature_layer(latitude, longitude, weather_version, _weather_data):
+    """Camada GeoJSON de temperatura horária (próximas 24h, amostrada a cada 3h)."""
+    hourly = _weather_data['hourly']
+    features = []
+    for i in range(0, min(len(hourly['time']), 24), 3):
+        temp = hourly['temperature_2m'][i]
+        if temp is not None:
+            features.append(_point_feature(
+                latitude + 0.01 * math.sin(i * math.pi / 4),
+                longitude + 0.01 * math.cos(i * math.pi / 4),
+                color='blue' if temp < 10 else 'green' if temp < 20 else 'orange' if temp < 30 else 'red',
+                popup=f"Temp: {temp}°C<br>Hora: {hourly['time'][i]}"
+            ))
+    return _feature_collection(features)
+
+
+@st.cache_data(ttl=3600, max_entries=256)
+def build_precipitation_layer(latitude, longitude, weather_version, _weather_data):
+    """Camada GeoJSON de precipitação diária (próximos 7 dias)."""
+    features = []
+    for i, precip in enumerate(_weather_data['daily']['precipitation_sum'][:7]):
+        if precip is not None and float(precip) > 0:
+            features.append(_point_feature(
+                latitude - 0.02 * i,
+                longitude + 0.02 * i,
+                radius=max(5, min(float(precip) * 2, 30)),
+                popup=f"Precipitação: {precip}mm"
+            ))
+    return _feature_collection(features)
+
+
+@st.cache_data(ttl=3600, max_entries=256)
+def build_fire_layer(latitude, longitude, fire_version, _fire_data, grid_degrees=None):
+    """Camadas dos focos de incêndio, montadas em bloco a partir das colunas.
+
+    Retorna `cells`, um GeoJSON com os focos agregados numa grade de
+    `grid_degrees` graus (quantidade, centróide e data mais recente por
+    célula), e `points`, a lista [lat, lon] de todos os focos para um
+    FastMarkerCluster. Nenhum foco é descartado.
+    """
+    grid_degrees = grid_degrees or FIRE_GRID_DEGREES
+    fire_data = _fire_data.dropna(subset=['latitude', 'longitude'])
+    lat = fire_data['latitude'].to_numpy(dtype=float)
+    lon = fire_data['longitude'].to_numpy(dtype=float)
+    acq_date = fire_data['acq_date'].astype(str) if 'acq_date' in fire_data.columns else pd.Series('N/A', index=fire_data.index)
+
+    cells = pd.DataFrame({
+        'row': np.floor(lat / grid_degrees).astype(np.int64),
+        'col': np.floor(lon / grid_degrees).astype(np.int64),
+        'latitude': lat,
+        'longitude': lon,
+        'acq_date': acq_date.to_numpy()
+    }).groupby(['row', 'col'], sort=False).agg(
+        count=('latitude', 'size'),
+        latitude=('latitude', 'mean'),
+        longitude=('longitude', 'mean'),
+        last_date=('acq_date', 'max')
+    )
+    radius = np.clip(4 + 3 * np.sqrt(cells['count'].to_numpy()), 5, 30).round(1)
+    popup = cells['count'].astype(str) + " foco(s)<br>Mais recente: " + cells['last_date']
+    features = [
+        _point_feature(cell_lat, cell_lon, count=count, radius=cell_radius, popup=cell_popup)
+        for cell_lat, cell_lon, count, cell_radius, cell_popup in zip(
+            cells['latitude'].round(5).tolist(), cells['longitude'].round(5).tolist(),
+            cells['count'].tolist(), radius.tolist(), popup.tolist())
+    ]
+    return {
+        'cells': _feature_collection(features),
+        'points': np.column_stack([lat, lon]).round(5).tolist()
+    }
+
+
+@st.cache_data(ttl=3600, max_entries=256)
+def build_air_quality_layer(latitude, longitude, air_quality_version, _air_quality_data):
+    """Camada GeoJSON com o IQA da hora atual, na cor da categoria."""
+    features = []
+    now_row = current_aqi(_air_quality_data)
+    if now_row is not None:
+        features.append(_point_feature(
+            latitude, longitude,
+            color=now_row['color'],
+            popup=(f"IQA: {int(now_row['aqi'])} ({now_row['category']})<br>"
+                   f"Poluente dominante: {now_row['dominant']}<br>{now_row['time']:%d/%m %H:%M}")
+        ))
+    return _feature_collection(features)
+
+
+def _feature_color(feature):
+    color = feature['properties'].get('color', 'blue')
+    return {'color': color, 'fillColor': color}
+
+
+def _feature_radius(feature):
+    return {'radius': feature['properties']['radius']}
+
+
+def _geojson_popup():
+    return folium.GeoJsonPopup(fields=['popup'], labels=False)
+
+
+def create_weather_map(latitude, longitude, city_name, weather_data=None, fire_data=None, air_quality_data=None, overlays=None):
+    """Cria um mapa meteorológico interativo com camadas.
+
+    As camadas vêm de fragmentos GeoJSON em cache (chave: localização e versão
+    dos dados); o mapa em si é montado a cada chamada, então `overlays`
+    (marcadores extras com latitude, longitude, popup e, opcionalmente,
+    color/icon) não invalidam nem alteram as camadas base.
+    """
     m = folium.Map(
         location=[latitude, longitude],
         zoom_start=10,
@@ -360,71 +1587,53 @@ def create_weather_map(latitude, longitude, city_name, weather_data=None, fire_d
 
     # Camada de Temperatura Horária (para as próximas 24h, amostrada)
     if weather_data and 'hourly' in weather_data:
-        temperature_layer = folium.FeatureGroup(name='Temperatura Horária (Próx. 24h)', show=False).add_to(m)
-        for i in range(0, min(len(weather_data['hourly']['time']), 24), 3):
-            temp = weather_data['hourly']['temperature_2m'][i]
-            time_str = weather_data['hourly']['time'][i]
-            if temp is not None:
-                color = 'blue' if temp < 10 else 'green' if temp < 20 else 'orange' if temp < 30 else 'red'
-                offset_lat = 0.01 * math.sin(i * math.pi / 4)
-                offset_lon = 0.01 * math.cos(i * math.pi / 4)
-                folium.CircleMarker(
-                    location=[latitude + offset_lat, longitude + offset_lon],
-                    radius=5,
-                    popup=f"Temp: {temp}°C<br>Hora: {time_str}",
-                    color=color,
-                    fill=True,
-                    fill_opacity=0.7
-                ).add_to(temperature_layer)
+        folium.GeoJson(
+            build_temperature_layer(latitude, longitude, data_version(weather_data), weather_data),
+            name='Temperatura Horária (Próx. 24h)', show=False,
+            marker=folium.CircleMarker(radius=5, fill=True, fill_opacity=0.7),
+            style_function=_feature_color, popup=_geojson_popup()
+        ).add_to(m)
 
     # Camada de Precipitação Diária (próximos 7 dias)
     if weather_data and 'daily' in weather_data:
-        precipitation_layer = folium.FeatureGroup(name='Precipitação Diária (Próx. 7 dias)', show=False).add_to(m)
-        for i, precip in enumerate(weather_data['daily']['precipitation_sum'][:7]):
-            if precip is not None and float(precip) > 0:
-                radius_size = max(5, min(float(precip) * 2, 30))
-                offset_lat = 0.02 * i
-                offset_lon = 0.02 * i
-                folium.Circle(
-                    location=[latitude - offset_lat, longitude + offset_lon],
-                    radius=radius_size,
-                    popup=f"Precipitação: {precip}mm",
-                    color='blue',
-                    fill=True,
-                    fill_opacity=0.3
-                ).add_to(precipitation_layer)
+        folium.GeoJson(
+            build_precipitation_layer(latitude, longitude, data_version(weather_data), weather_data),
+            name='Precipitação Diária (Próx. 7 dias)', show=False,
+            marker=folium.Circle(color='blue', fill=True, fill_opacity=0.3),
+            style_function=_feature_radius, popup=_geojson_popup()
+        ).add_to(m)
 
     # Camada de Focos de Incêndio (Cluster)
     if fire_data is not None and not fire_data.empty and 'latitude' in fire_data.columns and 'longitude' in fire_data.columns:
-        fire_data = fire_data.head(200)
-        marker_cluster = plugins.MarkerCluster(name='Focos de Incêndio (últimos 7 dias)').add_to(m)
-        for idx, row in fire_data.iterrows():
-            folium.Marker(
-                location=[row['latitude'], row['longitude']],
-                popup=f"Foco em {row.get('acq_date', 'N/A')}<br>Confiança: {row.get('confidence', 'N/A')}%",
-                icon=folium.Icon(color='darkred', icon='fire', prefix='fa')
-            ).add_to(marker_cluster)
+        fire_layer = build_fire_layer(latitude, longitude, data_version(fire_data), fire_data)
+        folium.GeoJson(
+            fire_layer['cells'],
+            name='Focos de Incêndio (últimos 7 dias)',
+            marker=folium.CircleMarker(color='darkred', fill=True, fill_color='orangered', fill_opacity=0.6, weight=1),
+            style_function=_feature_radius, popup=_geojson_popup()
+        ).add_to(m)
+        plugins.FastMarkerCluster(fire_layer['points'], name='Focos de Incêndio (pontos individuais)', show=False).add_to(m)
     else:
         folium.FeatureGroup(name='Sem Focos de Incêndio (7 dias)').add_to(m)
 
     # Camada de Qualidade do Ar (ponto colorido para o valor mais recente)
     if air_quality_data and air_quality_data.get('hourly'):
-        aq_layer = folium.FeatureGroup(name='Qualidade do Ar (PM2.5)', show=False).add_to(m)
-        if air_quality_data['hourly']['time']:
-            last_idx = -1
-            pm25 = air_quality_data['hourly']['pm2_5'][last_idx] if air_quality_data['hourly']['pm2_5'] else None
-            aq_time = air_quality_data['hourly']['time'][last_idx]
-            if pm25 is not None:
-                color = 'green' if pm25 < 15 else 'orange' if pm25 < 50 else 'red' if pm25 < 100 else 'purple'
-                folium.CircleMarker(
-                    location=[latitude, longitude],
-                    radius=8,
-                    popup=f"PM2.5: {pm25} µg/m³ ({aq_time})",
-                    color=color,
-                    fill=True,
-                    fill_opacity=0.7,
-                    tooltip="Qualidade do Ar (PM2.5)"
-                ).add_to(aq_layer)
+        folium.GeoJson(
+            build_air_quality_layer(latitude, longitude, data_version(air_quality_data), air_quality_data),
+            name='Qualidade do Ar (IQA)', show=False,
+            marker=folium.CircleMarker(radius=8, fill=True, fill_opacity=0.7),
+            style_function=_feature_color, popup=_geojson_popup(),
+            tooltip="Qualidade do Ar (IQA)"
+        ).add_to(m)
+
+    if overlays:
+        overlay_layer = folium.FeatureGroup(name='Eventos Extremos').add_to(m)
+        for overlay in overlays:
+            folium.Marker(
+                location=[overlay['latitude'], overlay['longitude']],
+                popup=overlay['popup'],
+                icon=folium.Icon(color=overlay.get('color', 'black'), icon=overlay.get('icon', 'exclamation-triangle'), prefix='fa')
+            ).add_to(overlay_layer)
 
     # Adicionar controles de camadas para o usuário poder alternar
     folium.LayerControl().add_to(m)
@@ -434,130 +1643,312 @@ def create_weather_map(latitude, longitude, city_name, weather_data=None, fire_d
     return m
 
 
-def generate_pdf_report(report):
-    """Gera um PDF do laudo técnico usando FPDF."""
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.set_font("Arial", size=12)
+@st.cache_data(ttl=3600, max_entries=64)
+def render_weather_map_html(latitude, longitude, city_name, versions, overlays, _weather_data=None, _fire_data=None, _air_quality_data=None):
+    """Renderiza o mapa como HTML; a chave de cache é a localização, as versões dos dados e os overlays."""
+    m = create_weather_map(latitude, longitude, city_name, _weather_data, _fire_data, _air_quality_data,
+                           overlays=[dict(overlay) for overlay in overlays])
+    return folium.Figure().add_child(m).render()
 
-    pdf.set_font("Arial", 'B', 16)
-    pdf.cell(200, 10, txt=report['title'], ln=1, align='C')
-    pdf.set_font("Arial", size=12)
-    pdf.ln(10)
 
-    pdf.cell(200, 10, txt=f"Data do laudo: {report['date']}", ln=1)
-    pdf.cell(200, 10, txt=f"Local: {report['location']['name']}, {report['location'].get('admin1', '')}", ln=1)
-    pdf.ln(5)
+def show_weather_map(latitude, longitude, city_name, weather_data=None, fire_data=None, air_quality_data=None, overlays=None, width=700, height=500):
+    """Exibe um mapa estático (sem retorno de interação) a partir do HTML em cache."""
+    versions = (data_version(weather_data), data_version(fire_data), data_version(air_quality_data))
+    overlay_key = tuple(tuple(sorted(overlay.items())) for overlay in overlays or [])
+    html = render_weather_map_html(latitude, longitude, city_name, versions, overlay_key,
+                                   _weather_data=weather_data, _fire_data=fire_data, _air_quality_data=air_quality_data)
+    st.components.v1.html(html, height=height + 10, width=width)
 
-    pdf.set_font("Arial", 'B', 14)
-    pdf.cell(200, 10, txt="Eventos Detectados:", ln=1)
-    pdf.set_font("Arial", size=12)
 
-    for event in report['events']:
-        pdf.cell(200, 10, txt=f"Data: {event['date']}", ln=1)
-        for e in event['events']:
-            pdf.multi_cell(0, 10, txt=f"- {e}")
-        pdf.ln(2)
+def reports_connection():
+    """Empresta uma conexão com o banco de laudos (WAL, do pool do processo)."""
+    return sqlite_connection(REPORTS_DB)
 
-    pdf.set_font("Arial", 'B', 14)
-    pdf.cell(200, 10, txt="Análise Técnica:", ln=1)
-    pdf.set_font("Arial", size=12)
-    pdf.multi_cell(0, 10, txt=report['analysis'])
-    pdf.ln(5)
 
-    pdf.set_font("Arial", 'B', 14)
-    pdf.cell(200, 10, txt="Recomendações:", ln=1)
-    pdf.set_font("Arial", size=12)
-    pdf.multi_cell(0, 10, txt=report['recommendations'])
+def save_report_to_db(city, event_date, report_type, pdf_content):
+    """Salva o laudo no banco de dados SQLite."""
+    with reports_connection() as conn:
+        digest = store_pdf_blob(conn, pdf_content)
+        cursor = conn.execute("INSERT INTO reports (city, date, event_date, report_type, pdf_sha256) VALUES (?, ?, ?, ?, ?)",
+                              (city, datetime.now().strftime("%Y-%m-%d"), event_date, report_type, digest))
+        conn.commit()
+        return cursor.lastrowid
+
+
+def _report_filters(city=None, start_date=None, end_date=None, report_type=None):
+    """Monta a cláusula WHERE (sem a palavra-chave) e os parâmetros dos filtros de laudos."""
+    clauses, params = [], []
+    if city:
+        clauses.append("city = ?")
+        params.append(city)
+    if report_type:
+        clauses.append("report_type = ?")
+        params.append(report_type)
+    if start_date:
+        clauses.append("event_date >= ?")
+        params.append(str(start_date))
+    if end_date:
+        clauses.append("event_date <= ?")
+        params.append(str(end_date))
+    return clauses, params
+
+
+def count_reports(city=None, start_date=None, end_date=None, report_type=None):
+    """Retorna a quantidade de laudos armazenados que atendem aos filtros."""
+    clauses, params = _report_filters(city, start_date, end_date, report_type)
+    query = "SELECT COUNT(*) FROM reports"
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    with reports_connection() as conn:
+        return conn.execute(query, params).fetchone()[0]
+
+
+def get_report_filter_options():
+    """Retorna as cidades e os tipos de laudo existentes (para os filtros da interface)."""
+    with reports_connection() as conn:
+        cities = [row[0] for row in conn.execute("SELECT DISTINCT city FROM reports ORDER BY city")]
+        report_types = [row[0] for row in conn.execute("SELECT DISTINCT report_type FROM reports ORDER BY report_type")]
+        return cities, report_types
+
+
+def get_reports_page(cursor=None, limit=REPORTS_PAGE_SIZE, city=None, start_date=None, end_date=None, report_type=None):
+    """Recupera uma página de laudos (sem o PDF) usando paginação por cursor.
+
+    `cursor` é o par (created_at, id) do último laudo da página anterior; os
+    filtros restringem por cidade, tipo e intervalo de data do evento.
+    Retorna (laudos, próximo cursor ou None se esta for a última página).
+    """
+    clauses, params = _report_filters(city, start_date, end_date, report_type)
+    if cursor is not None:
+        clauses.append("(created_at, id) < (?, ?)")
+        params.extend(cursor)
+    query = "SELECT id, city, date, event_date, report_type, created_at FROM reports"
+    if clauses:
+        query += " WHERE " + " AND ".join(clauses)
+    query += " ORDER BY created_at DESC, id DESC LIMIT ?"
+    params.append(limit + 1)
+    with reports_connection() as conn:
+        rows = conn.execute(query, params).fetchall()
+    next_cursor = (rows[limit - 1][5], rows[limit - 1][0]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def _iter_blob(conn, table, column, rowid, chunk_size):
+    """Lê um BLOB em blocos via E/S incremental do SQLite."""
+    if not hasattr(conn, "blobopen"):  # Python < 3.11
+        row = conn.execute(f"SELECT {column} FROM {table} WHERE rowid=?", (rowid,)).fetchone()
+        if row and row[0]:
+            yield row[0]
+        return
+    with conn.blobopen(table, column, rowid, readonly=True) as blob:
+        while True:
+            chunk = blob.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+def iter_pdf_chunks(conn, report_id, chunk_size=PDF_READ_CHUNK_SIZE):
+    """Lê o PDF de um laudo em blocos, descomprimindo-o à medida que é lido."""
+    row = conn.execute("SELECT b.id, b.compression FROM reports r JOIN report_blobs b ON b.sha256 = r.pdf_sha256 "
+                       "WHERE r.id=?", (report_id,)).fetchone()
+    if row is None:
+        # Laudo gravado antes da separação dos PDFs e ainda não migrado
+        yield from _iter_blob(conn, "reports", "pdf_content", report_id, chunk_size)
+        return
+    decompressor = zlib.decompressobj() if row[1] == "zlib" else None
+    for chunk in _iter_blob(conn, "report_blobs", "data", row[0], chunk_size):
+        yield decompressor.decompress(chunk) if decompressor else chunk
+    if decompressor:
+        yield decompressor.flush()
 
-    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.pdf')
-    pdf_path = temp_file.name
-    pdf.output(pdf_path)
 
-    with open(pdf_path, 'rb') as f:
-        pdf_content = f.read()
-    os.remove(pdf_path)
+def get_pdf_from_db(report_id):
+    """Recupera o conteúdo PDF de um laudo específico."""
+    pdf_content = bytearray()
+    with reports_connection() as conn:
+        for chunk in iter_pdf_chunks(conn, report_id):
+            pdf_content += chunk
+    return bytes(pdf_content)
 
-    return pdf_content
 
+def enqueue_report_job(city_data, start_date=None, end_date=None, events=None):
+    """Enfileira a geração de laudos de uma cidade e retorna o id do job.
 
-def save_report_to_db(city, event_date, report_type, pdf_content):
-    """Salva o laudo no banco de dados SQLite."""
-    conn = sqlite3.connect('weather_reports.db')
-    c = conn.cursor()
-    c.execute("INSERT INTO reports (city, date, event_date, report_type, pdf_content) VALUES (?, ?, ?, ?, ?)",
-              (city, datetime.now().strftime("%Y-%m-%d"), event_date, report_type, pdf_content))
-    conn.commit()
-    conn.close()
+    Sem `events`, o worker detecta todos os eventos extremos entre
+    `start_date` e `end_date` e gera um laudo para cada um.
+    """
+    payload = {"city_data": city_data, "start_date": start_date, "end_date": end_date, "events": events}
+    with reports_connection() as conn:
+        cursor = conn.execute("INSERT INTO report_jobs (city, payload, total) VALUES (?, ?, ?)",
+                              (city_data['name'], json.dumps(payload), len(events) if events is not None else None))
+        conn.commit()
+    get_report_job_worker().wake()
+    return cursor.lastrowid
+
+
+def get_report_jobs(city=None, limit=10):
+    """Lista os jobs de laudos mais recentes (opcionalmente de uma cidade)."""
+    query = "SELECT id, city, status, total, completed, report_ids, error, created_at FROM report_jobs"
+    params = []
+    if city:
+        query += " WHERE city = ?"
+        params.append(city)
+    query += " ORDER BY id DESC LIMIT ?"
+    params.append(limit)
+    with reports_connection() as conn:
+        return conn.execute(query, params).fetchall()
+
+
+class ReportJobWorker:
+    """Processa a fila de laudos em segundo plano.
+
+    Uma thread de despacho reivindica jobs da tabela `report_jobs` (de forma
+    atômica, então vários processos do app podem compartilhar a fila) e
+    renderiza os PDFs num pool de processos. O progresso é gravado a cada
+    laudo, de modo que um job interrompido é retomado de onde parou.
+    """
 
+    def __init__(self, max_workers):
+        self._wake = threading.Event()
+        self._pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+        self._thread = threading.Thread(target=self._run, name="report-jobs", daemon=True)
+        self._thread.start()
+
+    def wake(self):
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            # Qualquer falha (ex.: banco bloqueado) é registrada e a fila volta a
+            # ser consultada depois de uma pausa, sem derrubar a thread
+            try:
+                job = self._claim_next()
+                if job is None:
+                    self._wake.wait(timeout=REPORT_JOB_POLL_SECONDS)
+                    self._wake.clear()
+                    continue
+                try:
+                    self._process(*job)
+                except Exception as e:
+                    logger.exception("Falha ao gerar os laudos do job %s", job[0])
+                    self._update(job[0], status='failed', error=str(e))
+            except Exception:
+                logger.exception("Erro no processamento da fila de laudos")
+                time.sleep(REPORT_JOB_POLL_SECONDS)
+
+    def _claim_next(self):
+        with reports_connection() as conn:
+            conn.execute("UPDATE report_jobs SET status='queued' WHERE status='running' "
+                         "AND updated_at < datetime('now', ?)", (f"-{REPORT_JOB_STALE_SECONDS} seconds",))
+            conn.commit()
+            row = conn.execute("SELECT id, payload, completed, report_ids FROM report_jobs "
+                               "WHERE status='queued' ORDER BY id LIMIT 1").fetchone()
+            if row is None:
+                return None
+            claimed = conn.execute("UPDATE report_jobs SET status='running', updated_at=CURRENT_TIMESTAMP "
+                                   "WHERE id=? AND status='queued'", (row[0],)).rowcount
+            conn.commit()
+            return row if claimed else None
+
+    def _update(self, job_id, **fields):
+        assignments = ", ".join(f"{name}=?" for name in fields)
+        with reports_connection() as conn:
+            conn.execute(f"UPDATE report_jobs SET {assignments}, updated_at=CURRENT_TIMESTAMP WHERE id=?",
+                         (*fields.values(), job_id))
+            conn.commit()
+
+    def _process(self, job_id, payload, completed, report_ids):
+        payload = json.loads(payload)
+        report_ids = json.loads(report_ids)
+        city_data = payload["city_data"]
+        events = payload.get("events")
+        if events is None:
+            history = get_history_window(city_data["latitude"], city_data["longitude"], payload["start_date"], payload["end_date"])
+            if history is None:
+                raise RuntimeError("Não foi possível obter dados históricos para o período.")
+            events = detect_extreme_events(history, get_event_thresholds(city_data))
+            payload["events"] = events
+            self._update(job_id, payload=json.dumps(payload), total=len(events))
+
+        remaining = events[completed:]
+        futures = [self._pool.submit(render_laudo_pdf, [event], city_data) for event in remaining]
+        for event, future in zip(remaining, futures):
+            report_ids.append(save_report_to_db(city_data['name'], event['date'], "Evento Extremo", future.result()))
+            completed += 1
+            self._update(job_id, completed=completed, report_ids=json.dumps(report_ids))
+        self._update(job_id, status='done')
+
+
+@st.cache_resource
+def get_report_job_worker():
+    """Worker único (por processo) da fila de laudos."""
+    return ReportJobWorker(REPORT_JOB_WORKERS)
 
-def get_reports_from_db():
-    """Recupera todos os laudos do banco de dados."""
-    conn = sqlite3.connect('weather_reports.db')
-    c = conn.cursor()
-    c.execute("SELECT id, city, date, event_date, report_type FROM reports ORDER BY created_at DESC")
-    reports = c.fetchall()
-    conn.close()
-    return reports
 
+# --- FUNÇÕES DE EXIBIÇÃO ---
 
-def get_pdf_from_db(report_id):
-    """Recupera o conteúdo PDF de um laudo específico."""
-    conn = sqlite3.connect('weather_reports.db')
-    c = conn.cursor()
-    c.execute("SELECT pdf_content FROM reports WHERE id=?", (report_id,))
-    pdf_content = c.fetchone()[0]
-    conn.close()
-    return pdf_content
-
-
-def generate_technical_report(event_data, city_data, satellite_images=None):
-    """Gera um laudo técnico para eventos extremos."""
-    report = {
-        'title': f"Laudo Técnico de Evento Climático Extremo - {city_data['name']}",
-        'date': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-        'location': city_data,
-        'events': event_data,
-        'satellite_images': satellite_images,
-        'analysis': "Análise dos padrões climáticos observados.",
-        'recommendations': "Recomendações gerais para mitigar riscos e preparar para futuros eventos."
-    }
-    for event in event_data:
-        for e in event['events']:
-            if "Precipitação extrema" in e:
-                report['analysis'] += f"\n- Evento de precipitação intensa em {event['date']} pode indicar risco de alagamentos ou deslizamentos."
-            elif "Rajada de vento" in e:
-                report['analysis'] += f"\n- Rajadas de vento em {event['date']} podem ter causado danos a estruturas e vegetação."
-            elif "Onda de calor" in e:
-                report['analysis'] += f"\n- Período prolongado de calor em {event['date']} com impactos na saúde e consumo energético."
-            elif "Onda de frio" in e:
-                report['analysis'] += f"\n- Período prolongado de frio em {event['date']} com risco para agricultura e população vulnerável."
-    report['recommendations'] = """
-- Verificar estruturas físicas quanto a danos;
-- Monitorar áreas de risco para eventos futuros;
-- Acompanhar atualizações meteorológicas de fontes oficiais;
-- Implementar planos de contingência e evacuação conforme necessário;
-- Reforçar a infraestrutura em áreas de alto risco.
-"""
-    return report
+def temperature_labels(times, temperatures, icons=None, time_format="%H:%M"):
+    """Rótulos "hora<br>ícone<br>temperatura" de cada ponto, montados em bloco a partir das colunas."""
+    text = pd.Series(pd.to_datetime(times)).dt.strftime(time_format).to_numpy(dtype=object)
+    if icons is not None:
+        text = text + "<br>" + np.asarray(icons, dtype=object)
+    return text + "<br><b>" + pd.Series(temperatures).astype(str).to_numpy(dtype=object) + "°C</b>"
 
 
-# --- FUNÇÕES DE EXIBIÇÃO ---
+def build_temperature_figure(times, traces, labels=None, annotations=None, time_format="%H:%M",
+                             dtick=None, height=300, title=None):
+    """Gráfico de temperatura usado pelas visões horária (48 h) e de 16 dias.
+
+    `traces` é uma lista de (valores, argumentos de go.Scatter); a primeira é a
+    curva principal. Os rótulos de `labels` são desenhados acima dela numa
+    única trace em modo texto, e não como uma anotação de layout por ponto.
+    """
+    fig = go.Figure()
+    for values, style in traces:
+        fig.add_trace(go.Scatter(x=times, y=values, **style))
+
+    all_values = np.concatenate([np.asarray(values, dtype=float) for values, _ in traces])
+    low, high = np.nanmin(all_values), np.nanmax(all_values)
+    spread = high - low
+    if labels is not None:
+        offset = spread * 0.15 if spread > 0 else 5
+        fig.add_trace(go.Scatter(
+            x=times, y=np.asarray(traces[0][0], dtype=float) + offset,
+            mode="text", text=labels, textposition="top center", cliponaxis=False,
+            textfont=dict(size=12, color="black"), hoverinfo="skip", showlegend=False
+        ))
+
+    fig.update_layout(
+        title=title, xaxis_title="", yaxis_title="Temperatura (°C)",
+        hovermode="x unified", annotations=annotations or [], showlegend=len(traces) > 1,
+        xaxis=dict(tickformat=time_format, dtick=dtick, showgrid=True, tickangle=-45),
+        yaxis=dict(range=[low - spread * 0.25, high + spread * 0.25], showgrid=True),
+        margin=dict(l=40, r=40, t=60 if title else 30, b=10), height=height
+    )
+    return fig
+
 
-def show_current_weather(city_data, weather_data, fire_data=None, air_quality_data=None):
-    """Exibe as condições climáticas atuais e um mapa interativo."""
+def show_current_weather(city_data, forecast, fire_data=None, air_quality_data=None, location_fetch=None):
+    """Exibe as condições climáticas atuais e um mapa interativo.
+
+    Se `location_fetch` for informado, os focos de incêndio e a qualidade do ar
+    só são aguardados na montagem do mapa, depois das métricas já exibidas.
+    """
     st.header(f"⏱️ Condições Atuais em {city_data['name']}")
 
-    current = weather_data["current"]
-    daily = weather_data["daily"]
+    current = forecast.current
+    daily = forecast.daily
+    today = daily.iloc[0] if not daily.empty else None
 
     # Seção "hero" para a temperatura e condição atuais
     with st.container():
+        temp_range = f"Máx: {today['temperature_2m_max']}°C | Mín: {today['temperature_2m_min']}°C" if today is not None else ""
         st.markdown(f"""
         <div class="current-weather-hero">
             <h2>{current['temperature_2m']}°C {WEATHER_ICONS.get(current['weather_code'], '❓')}</h2>
             <p>{WEATHER_CODES.get(current['weather_code'], 'Desconhecido')}</p>
-            <p class="temp-range">Máx: {daily['temperature_2m_max'][0]}°C | Mín: {daily['temperature_2m_min'][0]}°C</p>
+            <p class="temp-range">{temp_range}</p>
         </div>
         """, unsafe_allow_html=True)
 
@@ -571,27 +1962,29 @@ def show_current_weather(city_data, weather_data, fire_data=None, air_quality_da
     cols_metrics_2[0].metric("🌧️ Precipitação (1h)", f"{current['precipitation']} mm")
     uv_index = current.get('uv_index')
     cols_metrics_2[1].metric("☀️ Índice UV", f"{uv_index}" if uv_index is not None else "N/A")
-    surface_pressure = weather_data['hourly'].get('surface_pressure')
-    if surface_pressure and len(surface_pressure) > 0:
-        cols_metrics_2[2].metric("📈 Pressão", f"{surface_pressure[0]} hPa")
+    hourly = forecast.hourly
+    if 'surface_pressure' in hourly.columns and not hourly.empty:
+        cols_metrics_2[2].metric("📈 Pressão", f"{hourly['surface_pressure'].iloc[0]} hPa")
     else:
         cols_metrics_2[2].metric("📈 Pressão", "N/A")
 
     st.subheader("Informações Diárias para Hoje")
-    if daily and daily['time']:
-        today_idx = 0
+    if today is not None:
         cols_daily = st.columns(3)
-        cols_daily[0].metric("☀️ Nascer do Sol", datetime.fromisoformat(daily['sunrise'][today_idx]).strftime("%H:%M"))
-        cols_daily[1].metric("🌙 Pôr do Sol", datetime.fromisoformat(daily['sunset'][today_idx]).strftime("%H:%M"))
-        cols_daily[2].metric("💧 Precipitação (24h)", f"{daily['precipitation_sum'][today_idx]} mm")
+        cols_daily[0].metric("☀️ Nascer do Sol", today['sunrise'].strftime("%H:%M"))
+        cols_daily[1].metric("🌙 Pôr do Sol", today['sunset'].strftime("%H:%M"))
+        cols_daily[2].metric("💧 Precipitação (24h)", f"{today['precipitation_sum']} mm")
 
     st.markdown("---")
     st.subheader("🌍 Mapa Interativo da Região")
+    if location_fetch is not None:
+        fire_data = location_fetch.result("fire", pd.DataFrame())
+        air_quality_data = location_fetch.result("air_quality")
     m = create_weather_map(
         city_data["latitude"],
         city_data["longitude"],
         city_data["name"],
-        weather_data=weather_data,
+        weather_data=forecast.raw,
         fire_data=fire_data,
         air_quality_data=air_quality_data
     )
@@ -604,29 +1997,26 @@ def show_current_weather(city_data, weather_data, fire_data=None, air_quality_da
         }
 
 
-def show_hourly_summary_and_detailed_chart(city_data, weather_data):
+def show_hourly_summary_and_detailed_chart(city_data, forecast):
     """Exibe uma visão geral horária e um gráfico detalhado."""
     st.header(f"Previsão Horária e Detalhada em {city_data['name']}")
 
-    if "hourly" not in weather_data:
+    hourly = forecast.hourly
+    if hourly.empty:
         st.warning("Dados de previsão horária não disponíveis.")
         return
 
-    hourly = weather_data["hourly"]
-    hourly_times = pd.to_datetime(hourly["time"])
-
-    df_hourly = pd.DataFrame({
-        "Hora": hourly_times,
-        "Temperatura (°C)": hourly["temperature_2m"],
-        "Sensação Térmica (°C)": hourly.get("apparent_temperature", hourly["temperature_2m"]),
-        "Precipitação (mm)": hourly["precipitation"],
-        "Condição": [WEATHER_CODES.get(code, "Desconhecido") for code in hourly["weather_code"]],
-        "Ícone": [WEATHER_ICONS.get(code, "❓") for code in hourly["weather_code"]],
-        "Vento (km/h)": hourly["wind_speed_10m"],
-        "Código Condição": hourly["weather_code"]
-    })
-
-    df_hourly_all_hours = df_hourly[df_hourly['Hora'] >= datetime.now()].head(48).reset_index(drop=True)
+    upcoming = hourly[hourly["time"] >= datetime.now()].head(48)
+    df_hourly_all_hours = pd.DataFrame({
+        "Hora": upcoming["time"],
+        "Temperatura (°C)": upcoming["temperature_2m"],
+        "Sensação Térmica (°C)": upcoming.get("apparent_temperature", upcoming["temperature_2m"]),
+        "Precipitação (mm)": upcoming["precipitation"],
+        "Condição": upcoming["condition"],
+        "Ícone": upcoming["icon"],
+        "Vento (km/h)": upcoming["wind_speed_10m"],
+        "Código Condição": upcoming["weather_code"]
+    }).reset_index(drop=True)
 
     if df_hourly_all_hours.empty:
         st.info("Nenhum dado de previsão horária disponível para as próximas 48 horas.")
@@ -652,48 +2042,23 @@ def show_hourly_summary_and_detailed_chart(city_data, weather_data):
         return
 
     st.subheader(f"Destaques Horários do Dia ({selected_date.strftime('%d/%m/%Y')})")
-    daily_data_api = weather_data["daily"]
     summary_points_info = []
 
-    selected_day_daily_data = next((
-        {key: daily_data_api[key][idx] for key in daily_data_api.keys()}
-        for idx, d_time_str in enumerate(daily_data_api['time'])
-        if pd.to_datetime(d_time_str).date() == selected_date
-    ), None)
-
-    if selected_day_daily_data:
-        sunrise_dt_for_summary = datetime.combine(selected_date, pd.to_datetime(selected_day_daily_data['sunrise']).time())
-        sunset_dt_for_summary = datetime.combine(selected_date, pd.to_datetime(selected_day_daily_data['sunset']).time())
-        noon_dt_selected_day = datetime.combine(selected_date, datetime.min.time().replace(hour=12))
-
-        # Amanhecer
-        sunrise_hourly_point = df_hourly_filtered_for_charts.iloc[(df_hourly_filtered_for_charts['Hora'] - sunrise_dt_for_summary).abs().argsort()[:1]]
-        if not sunrise_hourly_point.empty:
-            summary_points_info.append({
-                "Label": "☀️ Amanhecer",
-                "Temp": sunrise_hourly_point.iloc[0]['Temperatura (°C)'],
-                "Icon": sunrise_hourly_point.iloc[0]['Ícone'],
-                "Condition": sunrise_hourly_point.iloc[0]['Condição']
-            })
-
-        # Meio do Dia
-        noon_hourly_point = df_hourly_filtered_for_charts.iloc[(df_hourly_filtered_for_charts['Hora'] - noon_dt_selected_day).abs().argsort()[:1]]
-        if not noon_hourly_point.empty:
-            summary_points_info.append({
-                "Label": "🏙️ Meio do Dia",
-                "Temp": noon_hourly_point.iloc[0]['Temperatura (°C)'],
-                "Icon": noon_hourly_point.iloc[0]['Ícone'],
-                "Condition": noon_hourly_point.iloc[0]['Condição']
-            })
+    selected_day = forecast.daily_for(selected_date)
+    if selected_day is not None:
+        sunrise_dt = datetime.combine(selected_date, selected_day['sunrise'].time())
+        sunset_dt = datetime.combine(selected_date, selected_day['sunset'].time())
+        noon_dt = datetime.combine(selected_date, datetime.min.time().replace(hour=12))
 
-        # Pôr do Sol
-        sunset_hourly_point = df_hourly_filtered_for_charts.iloc[(df_hourly_filtered_for_charts['Hora'] - sunset_dt_for_summary).abs().argsort()[:1]]
-        if not sunset_hourly_point.empty:
+        highlights = [("☀️ Amanhecer", sunrise_dt), ("🏙️ Meio do Dia", noon_dt), ("🌙 Pôr do Sol", sunset_dt)]
+        nearest_rows = df_hourly_filtered_for_charts.iloc[
+            nearest_time_index(df_hourly_filtered_for_charts['Hora'], [instant for _, instant in highlights])]
+        for (label, _), (_, row) in zip(highlights, nearest_rows.iterrows()):
             summary_points_info.append({
-                "Label": "🌙 Pôr do Sol",
-                "Temp": sunset_hourly_point.iloc[0]['Temperatura (°C)'],
-                "Icon": sunset_hourly_point.iloc[0]['Ícone'],
-                "Condition": sunset_hourly_point.iloc[0]['Condição']
+                "Label": label,
+                "Temp": row['Temperatura (°C)'],
+                "Icon": row['Ícone'],
+                "Condition": row['Condição']
             })
 
     if summary_points_info:
@@ -713,15 +2078,10 @@ def show_hourly_summary_and_detailed_chart(city_data, weather_data):
     min_temp_chart = df_hourly_filtered_for_charts['Temperatura (°C)'].min()
     max_temp_chart = df_hourly_filtered_for_charts['Temperatura (°C)'].max()
     temp_range_diff_chart = max_temp_chart - min_temp_chart
-    annotation_offset_top = temp_range_diff_chart * 0.15 if temp_range_diff_chart > 0 else 5
     annotation_offset_bottom = temp_range_diff_chart * 0.10 if temp_range_diff_chart > 0 else 5
 
     st.subheader(f"Temperatura Horária ({selected_date.strftime('%d/%m/%Y')})")
-    fig_temp_stylized = go.Figure()
-
-    fig_temp_stylized.add_trace(go.Scatter(
-        x=df_hourly_filtered_for_charts['Hora'],
-        y=df_hourly_filtered_for_charts['Temperatura (°C)'],
+    temp_traces = [(df_hourly_filtered_for_charts['Temperatura (°C)'], dict(
         mode='lines+markers',
         name='Temperatura',
         line=dict(color='#FF7F00', width=3),
@@ -729,89 +2089,81 @@ def show_hourly_summary_and_detailed_chart(city_data, weather_data):
         fillcolor='rgba(255, 127, 0, 0.2)',
         hovertemplate="<b>Hora:</b> %{x|%H:%M}<br><b>Temp:</b> %{y}°C<br><b>Condição:</b> %{customdata[0]}<extra></extra>",
         customdata=df_hourly_filtered_for_charts[['Condição', 'Precipitação (mm)', 'Ícone']]
-    ))
-
-    annotations_temp_chart = []
-    for i, row in df_hourly_filtered_for_charts.iterrows():
-        annotations_temp_chart.append(
-            dict(
-                x=row['Hora'],
-                y=row['Temperatura (°C)'] + annotation_offset_top,
-                xref="x", yref="y",
-                text=f"{row['Hora'].strftime('%H:%M')}<br>{row['Ícone']}<br><b>{row['Temperatura (°C)']}°C</b>",
-                showarrow=False,
-                xanchor='center', yanchor='bottom',
-                font=dict(size=12, color="black"),
-                align="center"
-            )
-        )
-
-    if selected_day_daily_data:
-        sunrise_dt_chart = datetime.combine(selected_date, pd.to_datetime(selected_day_daily_data['sunrise']).time())
-        sunset_dt_chart = datetime.combine(selected_date, pd.to_datetime(selected_day_daily_data['sunset']).time())
-
-        if sunrise_dt_chart >= df_hourly_filtered_for_charts['Hora'].min() and sunrise_dt_chart <= df_hourly_filtered_for_charts['Hora'].max():
-            annotations_temp_chart.append(dict(x=sunrise_dt_chart, y=min_temp_chart - (annotation_offset_bottom / 2), text="☀️ Nascer do Sol", showarrow=False, font=dict(color="orange")))
-        if sunset_dt_chart >= df_hourly_filtered_for_charts['Hora'].min() and sunset_dt_chart <= df_hourly_filtered_for_charts['Hora'].max():
-            annotations_temp_chart.append(dict(x=sunset_dt_chart, y=min_temp_chart - (annotation_offset_bottom / 2), text="🌙 Pôr do Sol", showarrow=False, font=dict(color="purple")))
-
-    fig_temp_stylized.update_layout(
-        xaxis_title="", yaxis_title="Temperatura (°C)",
-        hovermode="x unified", annotations=annotations_temp_chart, showlegend=False,
-        xaxis=dict(tickformat="%H:%M", dtick="H1", showgrid=True, tickangle=-45),
-        yaxis=dict(range=[min_temp_chart - (temp_range_diff_chart * 0.25), max_temp_chart + (temp_range_diff_chart * 0.25)], showgrid=True),
-        margin=dict(l=40, r=40, t=30, b=10), height=300
-    )
-
-    if st.checkbox("Mostrar Sensação Térmica (Temperatura)", key="hourly_feels_like_toggle_temp_chart"):
-        fig_temp_stylized.add_trace(go.Scatter(
-            x=df_hourly_filtered_for_charts['Hora'],
-            y=df_hourly_filtered_for_charts['Sensação Térmica (°C)'],
+    ))]
+    show_feels_like = st.checkbox("Mostrar Sensação Térmica (Temperatura)", key="hourly_feels_like_toggle_temp_chart")
+    if show_feels_like:
+        temp_traces.append((df_hourly_filtered_for_charts['Sensação Térmica (°C)'], dict(
             mode='lines', name='Sensação Térmica',
             line=dict(color='#8B4513', width=2, dash='dot'),
             hovertemplate="<b>Hora:</b> %{x|%H:%M}<br><b>Sensação:</b> %{y}°C<extra></extra>"
-        ))
-        fig_temp_stylized.update_layout(showlegend=True)
+        )))
+
+    annotations_temp_chart = []
+    if selected_day is not None:
+        first_hour, last_hour = df_hourly_filtered_for_charts['Hora'].iloc[[0, -1]]
+        if first_hour <= sunrise_dt <= last_hour:
+            annotations_temp_chart.append(dict(x=sunrise_dt, y=min_temp_chart - (annotation_offset_bottom / 2), text="☀️ Nascer do Sol", showarrow=False, font=dict(color="orange")))
+        if first_hour <= sunset_dt <= last_hour:
+            annotations_temp_chart.append(dict(x=sunset_dt, y=min_temp_chart - (annotation_offset_bottom / 2), text="🌙 Pôr do Sol", showarrow=False, font=dict(color="purple")))
+
+    # Início, fim e número de horas identificam a janela (o dia pode vir incompleto nas pontas da previsão)
+    chart_options = dict(day=selected_date.isoformat(),
+                         first_hour=df_hourly_filtered_for_charts['Hora'].iloc[0].isoformat(),
+                         last_hour=df_hourly_filtered_for_charts['Hora'].iloc[-1].isoformat(),
+                         rows=len(df_hourly_filtered_for_charts))
+    fig_temp_stylized = cached_figure(
+        "hourly_temperature", city_data["latitude"], city_data["longitude"], forecast.version,
+        lambda: build_temperature_figure(
+            df_hourly_filtered_for_charts['Hora'], temp_traces,
+            labels=temperature_labels(df_hourly_filtered_for_charts['Hora'], df_hourly_filtered_for_charts['Temperatura (°C)'],
+                                      df_hourly_filtered_for_charts['Ícone']),
+            annotations=annotations_temp_chart, dtick="H1"
+        ),
+        feels_like=show_feels_like, **chart_options
+    )
 
     st.plotly_chart(fig_temp_stylized, use_container_width=True)
 
     if df_hourly_filtered_for_charts['Precipitação (mm)'].sum() > 0:
         st.subheader(f"Precipitação Horária ({selected_date.strftime('%d/%m/%Y')})")
-        fig_precip_stylized = go.Figure(go.Bar(
-            x=df_hourly_filtered_for_charts['Hora'],
-            y=df_hourly_filtered_for_charts['Precipitação (mm)'],
-            name='Precipitação', marker_color='blue',
-            hovertemplate="<b>Hora:</b> %{x|%H:%M}<br><b>Precipitação:</b> %{y}mm<extra></extra>"
-        ))
-        fig_precip_stylized.update_layout(
-            xaxis_title="", yaxis_title="Precipitação (mm)", hovermode="x unified", showlegend=False,
-            xaxis=dict(showgrid=True, tickangle=-45, rangeslider=dict(visible=True, thickness=0.2), tickformat="%H:%M", dtick="H1"),
-            yaxis=dict(range=[0, df_hourly_filtered_for_charts['Precipitação (mm)'].max() * 1.5 if df_hourly_filtered_for_charts['Precipitação (mm)'].max() > 0 else 5], showgrid=True),
-            margin=dict(l=40, r=40, t=10, b=40), height=200
-        )
+        def build_precip_chart():
+            fig = go.Figure(go.Bar(
+                x=df_hourly_filtered_for_charts['Hora'],
+                y=df_hourly_filtered_for_charts['Precipitação (mm)'],
+                name='Precipitação', marker_color='blue',
+                hovertemplate="<b>Hora:</b> %{x|%H:%M}<br><b>Precipitação:</b> %{y}mm<extra></extra>"
+            ))
+            fig.update_layout(
+                xaxis_title="", yaxis_title="Precipitação (mm)", hovermode="x unified", showlegend=False,
+                xaxis=dict(showgrid=True, tickangle=-45, rangeslider=dict(visible=True, thickness=0.2), tickformat="%H:%M", dtick="H1"),
+                yaxis=dict(range=[0, df_hourly_filtered_for_charts['Precipitação (mm)'].max() * 1.5 if df_hourly_filtered_for_charts['Precipitação (mm)'].max() > 0 else 5], showgrid=True),
+                margin=dict(l=40, r=40, t=10, b=40), height=200
+            )
+            return fig
+
+        fig_precip_stylized = cached_figure("hourly_precipitation", city_data["latitude"], city_data["longitude"],
+                                            forecast.version, build_precip_chart, **chart_options)
         st.plotly_chart(fig_precip_stylized, use_container_width=True)
     else:
         st.info(f"Nenhuma precipitação prevista para {selected_date.strftime('%d/%m/%Y')}.")
 
 
-def show_weekly_forecast(city_data, weather_data):
+def show_weekly_forecast(city_data, forecast):
     """Exibe a previsão do tempo para os próximos 7 dias."""
     st.header(f"📅 Previsão para 7 Dias em {city_data['name']}")
-    if "daily" in weather_data:
-        daily = weather_data["daily"]
-        dates = pd.to_datetime(daily["time"])
-
+    if not forecast.daily.empty:
+        week = forecast.daily.head(7)
         df = pd.DataFrame({
-            "Data": dates,
-            "Máxima (°C)": daily["temperature_2m_max"],
-            "Mínima (°C)": daily["temperature_2m_min"],
-            "Precipitação (mm)": daily["precipitation_sum"],
-            "Vento (km/h)": daily["wind_speed_10m_max"],
-            "Direção Vento": daily["wind_direction_10m_dominant"],
-            "Índice UV Máx": daily.get("uv_index_max", [None] * len(dates)),
-            "Condição": [WEATHER_CODES.get(code, "Desconhecido") for code in daily["weather_code"]],
-            "Ícone": [WEATHER_ICONS.get(code, "❓") for code in daily["weather_code"]]
-        }).head(7)
+            "Data": week["time"],
+            "Máxima (°C)": week["temperature_2m_max"],
+            "Mínima (°C)": week["temperature_2m_min"],
+            "Precipitação (mm)": week["precipitation_sum"],
+            "Vento (km/h)": week["wind_speed_10m_max"],
+            "Direção Vento": week["wind_direction_10m_dominant"],
+            "Índice UV Máx": week.get("uv_index_max"),
+            "Condição": week["condition"],
+            "Ícone": week["icon"]
+        })
 
         fig_temp = px.line(
             df, x="Data", y=["Máxima (°C)", "Mínima (°C)"], title="Temperaturas Diárias",
@@ -842,46 +2194,59 @@ def show_weekly_forecast(city_data, weather_data):
                 st.write(f"{row['Mínima (°C)']}°C")
             st.markdown("---")
 
-        upcoming_events = detect_extreme_events({"daily": {k: v[:7] for k, v in daily.items()}})
+        upcoming_events = detect_extreme_events({"daily": {k: v[:7] for k, v in forecast.raw["daily"].items()}},
+                                                get_event_thresholds(city_data))
         if upcoming_events:
             st.warning("⚠️ Alertas para os próximos dias:")
             for event in upcoming_events:
                 st.write(f"- **{event['date']}**: {', '.join(event['events'])}")
 
 
-def show_extended_forecast(city_data, weather_data):
+def show_extended_forecast(city_data, forecast):
     """Exibe a previsão do tempo estendida (até 16 dias)."""
     st.header(f"📊 Previsão Estendida para 16 Dias em {city_data['name']}")
     st.info("Esta é a previsão máxima disponível na API Open-Meteo")
 
-    if "daily" in weather_data:
-        daily = weather_data["daily"]
-        dates = pd.to_datetime(daily["time"])
-        st.write(f"**A API retornou dados para {len(dates)} dias.**")
+    if not forecast.daily.empty:
+        daily = forecast.daily
+        st.write(f"**A API retornou dados para {len(daily)} dias.**")
 
         df = pd.DataFrame({
-            "Data": dates,
+            "Data": daily["time"],
             "Máxima (°C)": daily["temperature_2m_max"],
             "Mínima (°C)": daily["temperature_2m_min"],
             "Precipitação (mm)": daily["precipitation_sum"],
             "Vento Máx (km/h)": daily["wind_speed_10m_max"],
             "Direção Vento": daily["wind_direction_10m_dominant"],
-            "Índice UV Máx": daily.get("uv_index_max", [None] * len(dates)),
-            "Condição": [WEATHER_CODES.get(code, "Desconhecido") for code in daily["weather_code"]]
+            "Índice UV Máx": daily.get("uv_index_max"),
+            "Condição": daily["condition"],
+            "Ícone": daily["icon"]
         })
 
         tab1, tab2, tab3, tab4 = st.tabs(["Temperaturas", "Precipitação", "Ventos", "UV e Condição"])
 
         with tab1:
-            fig_temp_ext = px.line(df, x="Data", y=["Máxima (°C)", "Mínima (°C)"], title="Temperaturas (Até 16 Dias)", line_shape="spline")
+            def build_temperature_chart():
+                return build_temperature_figure(
+                    df["Data"],
+                    [(df["Máxima (°C)"], dict(mode="lines+markers", name="Máxima (°C)", line=dict(color="#FF5733", shape="spline"))),
+                     (df["Mínima (°C)"], dict(mode="lines+markers", name="Mínima (°C)", line=dict(color="#3366FF", shape="spline")))],
+                    labels=temperature_labels(df["Data"], df["Máxima (°C)"], df["Ícone"], time_format="%d/%m"),
+                    time_format="%d/%m", dtick=86400000, height=450, title="Temperaturas (Até 16 Dias)"
+                )
+
+            fig_temp_ext = cached_figure("extended_temperature", city_data["latitude"], city_data["longitude"],
+                                         forecast.version, build_temperature_chart)
             st.plotly_chart(fig_temp_ext, use_container_width=True)
 
         with tab2:
-            fig_precip_ext = px.bar(df, x="Data", y="Precipitação (mm)", title="Precipitação Acumulada (Até 16 Dias)")
+            fig_precip_ext = cached_figure("extended_precipitation", city_data["latitude"], city_data["longitude"], forecast.version,
+                                           lambda: px.bar(df, x="Data", y="Precipitação (mm)", title="Precipitação Acumulada (Até 16 Dias)"))
             st.plotly_chart(fig_precip_ext, use_container_width=True)
 
         with tab3:
-            fig_wind_ext = px.bar(df, x="Data", y="Vento Máx (km/h)", title="Velocidade Máxima do Vento (Até 16 Dias)")
+            fig_wind_ext = cached_figure("extended_wind", city_data["latitude"], city_data["longitude"], forecast.version,
+                                         lambda: px.bar(df, x="Data", y="Vento Máx (km/h)", title="Velocidade Máxima do Vento (Até 16 Dias)"))
             st.plotly_chart(fig_wind_ext, use_container_width=True)
 
         with tab4:
@@ -890,48 +2255,67 @@ def show_extended_forecast(city_data, weather_data):
             st.dataframe(uv_df)
 
 
-def show_extreme_events(city_data, weather_data):
+def extreme_events_window(period_label):
+    """Datas (início, fim) do período de análise de eventos extremos."""
+    end_date = datetime.now().strftime("%Y-%m-%d")
+    start_date = (datetime.now() - timedelta(days=EXTREME_EVENT_PERIODS[period_label])).strftime("%Y-%m-%d")
+    return start_date, end_date
+
+
+def show_extreme_events(city_data, forecast):
     """Monitora e exibe eventos climáticos extremos históricos."""
     st.header("⚠️ Monitoramento de Eventos Extremos")
 
-    end_date = datetime.now().strftime("%Y-%m-%d")
-    start_date = (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d")
+    period_label = st.selectbox("Período de análise:", list(EXTREME_EVENT_PERIODS), key="extreme_events_period")
+    start_date, end_date = extreme_events_window(period_label)
 
     with st.spinner("Analisando dados históricos..."):
-        historical_data = get_historical_weather_data(city_data["latitude"], city_data["longitude"], start_date, end_date)
+        historical_data = get_history_window(city_data["latitude"], city_data["longitude"], start_date, end_date)
 
     if not historical_data:
         st.error("❌ Não foi possível obter dados históricos para análise")
         return
 
-    extreme_events = detect_extreme_events(historical_data)
+    extreme_events = detect_extreme_events(historical_data, get_event_thresholds(city_data))
     if not extreme_events:
-        st.success("✅ Nenhum evento extremo detectado nos últimos 30 dias")
+        st.success(f"✅ Nenhum evento extremo detectado nos últimos {period_label}")
         return
 
-    st.warning(f"🔴 Foram detectados {len(extreme_events)} eventos extremos nos últimos 30 dias")
+    st.warning(f"🔴 Foram detectados {len(extreme_events)} eventos extremos nos últimos {period_label}")
+    if st.button(f"📝 Gerar laudos de todos os eventos ({period_label})", key="report_all_events"):
+        enqueue_report_job(city_data, start_date=start_date, end_date=end_date)
+        st.success(f"Geração de {len(extreme_events)} laudos enfileirada.")
+    # O painel é desenhado só depois dos botões por evento (abaixo), para que um
+    # laudo enfileirado nesta execução já apareça e ative a atualização periódica
+    jobs_panel = st.container()
+
+    st.subheader("🗺️ Mapa dos Eventos")
+    event_dates = [event['date'] for event in extreme_events]
+    if len(event_dates) > 1:
+        first_date, last_date = st.select_slider("Período exibido no mapa:", options=event_dates,
+                                                  value=(event_dates[0], event_dates[-1]), key="extreme_events_map_range")
+    else:
+        first_date = last_date = event_dates[0]
+    map_events = [event for event in extreme_events if first_date <= event['date'] <= last_date]
+    show_weather_map(
+        city_data["latitude"], city_data["longitude"], city_data["name"],
+        overlays=build_event_overlays(city_data["latitude"], city_data["longitude"], map_events),
+        height=400
+    )
+
     for event in extreme_events:
         with st.expander(f"📅 Evento em {event['date']}", expanded=False):
             st.error("Eventos detectados:")
             for e in event['events']:
                 st.write(f"- 🔥 {e}")
 
-            event_map = create_weather_map(city_data["latitude"], city_data["longitude"], city_data["name"])
-            folium.Marker(
-                location=[city_data["latitude"], city_data["longitude"]],
-                popup=f"Evento extremo em {event['date']}",
-                icon=folium.Icon(color='black', icon='exclamation-triangle', prefix='fa')
-            ).add_to(event_map)
-            folium_static(event_map, width=700, height=400)
-
             satellite_img = get_satellite_images(city_data["latitude"], city_data["longitude"], event['date'])
             st.image(satellite_img['image_url'], caption=f"🌍 Imagem de satélite aproximada - {satellite_img['source']} ({event['date']})")
 
             if st.button(f"📝 Gerar Laudo Técnico para {event['date']}", key=f"report_{event['date']}", type="primary", help="Clique para gerar um laudo técnico detalhado deste evento"):
                 report = generate_technical_report([event], city_data, [satellite_img])
-                pdf_content = generate_pdf_report(report)
-                save_report_to_db(city_data['name'], event['date'], "Evento Extremo", pdf_content)
-                st.success("Laudo técnico gerado e armazenado com sucesso!")
+                enqueue_report_job(city_data, events=[event])
+                st.success("Laudo técnico enfileirado! O PDF ficará disponível em \"Laudos em Processamento\".")
 
                 st.subheader("📄 Laudo Técnico")
                 st.write(f"**Local:** {report['location']['name']}, {report['location'].get('admin1', '')}")
@@ -941,76 +2325,410 @@ def show_extreme_events(city_data, weather_data):
                 st.write(report['analysis'])
                 st.subheader("🛡️ Recomendações")
                 st.write(report['recommendations'])
+
+    with jobs_panel:
+        show_report_jobs(city_data['name'])
+
+
+# Cor do marcador no mapa de eventos, pelo primeiro tipo de evento do dia
+EVENT_MARKER_COLORS = {
+    "Precipitação extrema": 'blue',
+    "Rajada de vento": 'gray',
+    "Onda de calor": 'red',
+    "Onda de frio": 'lightblue',
+}
+
+
+def build_event_overlays(latitude, longitude, events):
+    """Marcadores dos eventos extremos, distribuídos em espiral ao redor da cidade."""
+    overlays = []
+    for i, event in enumerate(events):
+        angle = i * 2.4  # ângulo áureo (rad): espalha os pontos sem sobreposição
+        distance = 0.01 * math.sqrt(i + 1)
+        color = next((c for label, c in EVENT_MARKER_COLORS.items() if event['events'][0].startswith(label)), 'black')
+        overlays.append({
+            "latitude": round(latitude + distance * math.sin(angle), 5),
+            "longitude": round(longitude + distance * math.cos(angle), 5),
+            "popup": f"<b>Evento extremo em {event['date']}</b><br>" + "<br>".join(event['events']),
+            "color": color
+        })
+    return overlays
+
+
+def _render_report_jobs(city_name):
+    """Lista os jobs de laudos da cidade com status e progresso."""
+    jobs = get_report_jobs(city_name)
+    if not jobs:
+        st.caption("Nenhum laudo em processamento para esta cidade.")
+        return
+    status_labels = {'queued': "⏳ Na fila", 'running': "⚙️ Gerando", 'done': "✅ Concluído", 'failed': "❌ Falhou"}
+    for job_id, _, status, total, completed, report_ids, error, created_at in jobs:
+        st.write(f"**Job #{job_id}** ({created_at}) — {status_labels.get(status, status)}")
+        if total:
+            st.progress(completed / total, text=f"{completed} de {total} laudos")
+        if error:
+            st.error(error)
+        report_ids = json.loads(report_ids)
+        if status == 'done' and len(report_ids) == 1:
+            # Como na listagem de laudos, o PDF só é lido do banco quando o usuário pede
+            pdf_ready_key = f"pdf_ready_{report_ids[0]}"
+            if st.session_state.get(pdf_ready_key) or st.button("📄 Preparar PDF", key=f"job_prepare_{job_id}"):
+                st.session_state[pdf_ready_key] = True
                 st.download_button(
                     label="⬇️ Download do Laudo (PDF)",
-                    data=pdf_content,
-                    file_name=f"laudo_{city_data['name']}_{event['date']}.pdf",
-                    mime="application/pdf"
+                    data=get_pdf_from_db(report_ids[0]),
+                    file_name=f"laudo_{city_name}_{report_ids[0]}.pdf",
+                    mime="application/pdf",
+                    key=f"job_download_{job_id}",
+                    on_click="ignore"
                 )
+        elif status == 'done' and report_ids:
+            st.caption("Laudos disponíveis em \"Ver Laudos Armazenados\".")
+
+
+def show_report_jobs(city_name):
+    """Exibe a fila de laudos da cidade, atualizada periodicamente enquanto houver jobs ativos."""
+    active = any(job[2] in ('queued', 'running') for job in get_report_jobs(city_name))
+    st.subheader("🗂️ Laudos em Processamento")
+    st.fragment(_render_report_jobs, run_every=REPORT_JOB_POLL_SECONDS if active else None)(city_name)
 
 
 def show_reports_section():
-    """Exibe e permite o download de laudos técnicos armazenados."""
+    """Exibe e permite o download de laudos técnicos armazenados.
+
+    A listagem é paginada e o PDF de cada laudo só é lido do banco quando o
+    usuário pede para prepará-lo.
+    """
     st.header("📂 Laudos Técnicos Armazenados")
-    reports = get_reports_from_db()
-    if reports:
-        st.write(f"Total de laudos: {len(reports)}")
-        for report in reports:
-            with st.expander(f"Laudo #{report[0]} - {report[1]} ({report[3]})"):
-                st.write(f"**Cidade:** {report[1]}")
-                st.write(f"**Data do Laudo:** {report[2]}")
-                st.write(f"**Data do Evento:** {report[3]}")
-                st.write(f"**Tipo:** {report[4]}")
-                pdf_content = get_pdf_from_db(report[0])
+    st.button("✖️ Fechar laudos", key="close_reports", on_click=lambda: st.session_state.update(show_stored_reports=False))
+
+    if not count_reports():
+        st.info("Nenhum laudo técnico armazenado ainda.")
+        return
+
+    cities, report_types = get_report_filter_options()
+    col_city, col_type, col_dates = st.columns(3)
+    with col_city:
+        city = st.selectbox("Cidade", ["Todas"] + cities, key="reports_filter_city")
+    with col_type:
+        report_type = st.selectbox("Tipo", ["Todos"] + report_types, key="reports_filter_type")
+    with col_dates:
+        event_dates = st.date_input("Data do evento", value=(), key="reports_filter_dates")
+    filters = {
+        "city": None if city == "Todas" else city,
+        "report_type": None if report_type == "Todos" else report_type,
+        "start_date": event_dates[0] if len(event_dates) > 0 else None,
+        "end_date": event_dates[1] if len(event_dates) > 1 else None,
+    }
+    if st.session_state.get("reports_filters") != filters:
+        st.session_state.reports_filters = filters
+        st.session_state.reports_page_cursors = [None]
+
+    total = count_reports(**filters)
+    st.write(f"Total de laudos: {total}")
+    if not total:
+        return
+    cursors = st.session_state.setdefault("reports_page_cursors", [None])
+    reports, next_cursor = get_reports_page(cursors[-1], **filters)
+    for report in reports:
+        with st.expander(f"Laudo #{report[0]} - {report[1]} ({report[3]})"):
+            st.write(f"**Cidade:** {report[1]}")
+            st.write(f"**Data do Laudo:** {report[2]}")
+            st.write(f"**Data do Evento:** {report[3]}")
+            st.write(f"**Tipo:** {report[4]}")
+            pdf_ready_key = f"pdf_ready_{report[0]}"
+            if st.session_state.get(pdf_ready_key) or st.button("📄 Preparar PDF", key=f"prepare_{report[0]}"):
+                st.session_state[pdf_ready_key] = True
                 st.download_button(
                     label="⬇️ Download PDF",
-                    data=pdf_content,
+                    data=get_pdf_from_db(report[0]),
                     file_name=f"laudo_{report[0]}_{report[1]}.pdf",
                     mime="application/pdf",
-                    key=f"download_{report[0]}"
+                    key=f"download_{report[0]}",
+                    on_click="ignore"
                 )
-    else:
-        st.info("Nenhum laudo técnico armazenado ainda.")
 
+    col_prev, col_page, col_next = st.columns([1, 2, 1])
+    with col_prev:
+        if len(cursors) > 1:
+            st.button("⬅️ Anterior", key="reports_prev_page", on_click=cursors.pop)
+    with col_page:
+        st.write(f"Página {len(cursors)} de {math.ceil(total / REPORTS_PAGE_SIZE)}")
+    with col_next:
+        if next_cursor is not None:
+            st.button("Próxima ➡️", key="reports_next_page", on_click=cursors.append, args=(next_cursor,))
 
-@st.cache_data(ttl=600)  # Cache por 10 minutos
-def get_fire_data(latitude, longitude, radius_km=100, days_back=7):
-    """Obtém dados de focos de incêndio próximos à localização."""
-    try:
-        delta_lat = radius_km / 111.32
-        delta_lon = radius_km / (111.32 * abs(math.cos(math.radians(latitude)))) if latitude != 0 else delta_lat
 
-        min_lat, max_lat = latitude - delta_lat, latitude + delta_lat
-        min_lon, max_lon = longitude - delta_lon, longitude + delta_lon
+def haversine_km(latitude, longitude, latitudes, longitudes):
+    """Distância (km) de um ponto a cada ponto dos arrays de coordenadas."""
+    lat1, lon1 = math.radians(latitude), math.radians(longitude)
+    lat2, lon2 = np.radians(latitudes), np.radians(longitudes)
+    a = np.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371.0 * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
 
-        area = f"{min_lon},{min_lat},{max_lon},{max_lat}"
-        date = (datetime.now() - timedelta(days=days_back)).strftime("%Y-%m-%d")
 
-        url = NASA_FIRMS_API.format(api_key=NASA_API_KEY, area=area, date=date)
+def _radius_bounds(latitude, longitude, radius_km):
+    """Retângulo (oeste, sul, leste, norte) que contém o círculo do raio."""
+    delta_lat = radius_km / 111.32
+    cos_lat = abs(math.cos(math.radians(latitude)))
+    delta_lon = min(radius_km / (111.32 * cos_lat), 180) if cos_lat > 1e-6 else 180
+    return longitude - delta_lon, latitude - delta_lat, longitude + delta_lon, latitude + delta_lat
 
-        response = requests.get(url)
+
+def empty_fire_frame():
+    """DataFrame vazio com o esquema tipado dos focos de incêndio."""
+    return apply_fire_schema(pd.DataFrame(columns=FIRE_COLUMNS))
+
+
+def apply_fire_schema(df):
+    """Converte as colunas dos focos para o esquema de FIRE_DTYPES (datas como datetime)."""
+    df = df.reindex(columns=FIRE_COLUMNS)
+    df["acq_date"] = pd.to_datetime(df["acq_date"], format="%Y-%m-%d", errors="coerce")
+    return df.astype(FIRE_DTYPES)
+
+
+def read_fire_csv(stream):
+    """Lê o CSV da FIRMS em blocos, já tipado e só com as colunas de FIRE_COLUMNS.
+
+    Cada bloco de FIRE_CSV_CHUNK_ROWS linhas é convertido ao chegar, então o
+    texto bruto e um DataFrame de objetos nunca ficam inteiros na memória.
+
+    Levanta ValueError se a resposta não for o CSV esperado (por exemplo, a
+    mensagem de texto que a FIRMS devolve quando a chave é inválida), para que
+    o dia não seja registrado como baixado.
+    """
+    try:
+        reader = pd.read_csv(stream, usecols=lambda column: column in FIRE_COLUMNS,
+                             dtype=FIRE_DTYPES,
+                             chunksize=FIRE_CSV_CHUNK_ROWS)
+        chunks = []
+        for chunk in reader:
+            missing = [column for column in FIRE_REQUIRED_COLUMNS if column not in chunk.columns]
+            if missing:
+                raise ValueError(f"Resposta da NASA FIRMS sem as colunas esperadas ({', '.join(missing)}).")
+            chunks.append(apply_fire_schema(chunk))
+    except pd.errors.EmptyDataError:
+        raise ValueError("Resposta vazia da NASA FIRMS.") from None
+    if not chunks:
+        return empty_fire_frame()
+    # Os blocos podem ter categorias diferentes; unificá-las evita que o concat caia em object
+    categories = {
+        column: pd.CategoricalDtype(sorted(set().union(*(chunk[column].cat.categories.astype(str) for chunk in chunks))))
+        for column, dtype in FIRE_DTYPES.items() if dtype == "category"
+    }
+    return pd.concat([chunk.astype(categories) for chunk in chunks], ignore_index=True)
+
+
+def fetch_fire_area(area, start_date, day_range=1):
+    """Baixa da NASA FIRMS os focos de `day_range` dias (UTC) a partir de `start_date`."""
+    url = NASA_FIRMS_API.format(api_key=NASA_API_KEY, area=area, day_range=day_range, date=start_date)
+    with http_get(url, stream=True) as response:
         response.raise_for_status()
+        response.raw.decode_content = True  # descompacta gzip/deflate durante a leitura
+        return read_fire_csv(response.raw)
+
+
+class FireStore:
+    """Arquivo local dos focos VIIRS da região de cobertura (SQLite).
 
-        if response.text.strip():
-            df = pd.read_csv(StringIO(response.text))
+    Os focos são baixados por dia, num único CSV da região inteira, e
+    guardados ordenados pela célula de uma grade de FIRE_INDEX_DEGREES graus,
+    que serve de índice espacial: uma consulta por raio lê só as células que
+    tocam o círculo e depois filtra pela distância real.
+    """
+
+    def __init__(self, db_path, area):
+        self.db_path = db_path
+        self.area = area
+        self.bounds = tuple(float(value) for value in area.split(","))
+        with sqlite_connection(db_path) as conn:
+            conn.execute('''CREATE TABLE IF NOT EXISTS fire_detections
+                            (cell_row INTEGER,
+                             cell_col INTEGER,
+                             acq_date TEXT,
+                             acq_time INTEGER,
+                             latitude REAL,
+                             longitude REAL,
+                             satellite TEXT,
+                             confidence TEXT,
+                             frp REAL,
+                             daynight TEXT,
+                             bright_ti4 REAL,
+                             PRIMARY KEY (cell_row, cell_col, acq_date, acq_time, latitude, longitude)) WITHOUT ROWID''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_fire_detections_date ON fire_detections(acq_date)")
+            conn.execute('''CREATE TABLE IF NOT EXISTS fire_days
+                            (acq_date TEXT PRIMARY KEY,
+                             fetched_at REAL)''')
+            conn.commit()
+
+    def covers(self, latitude, longitude, radius_km):
+        """Indica se o círculo do raio está inteiro dentro da região de cobertura."""
+        west, south, east, north = self.bounds
+        min_lon, min_lat, max_lon, max_lat = _radius_bounds(latitude, longitude, radius_km)
+        return west <= min_lon and max_lon <= east and south <= min_lat and max_lat <= north
+
+    def pending_days(self, days):
+        """Dias (ISO, UTC) que ainda precisam ser baixados ou atualizados.
+
+        Um dia é definitivo quando foi baixado depois de passados
+        FIRE_SETTLE_DAYS dias do seu fim; antes disso é baixado de novo a
+        cada FIRE_REFRESH_SECONDS.
+        """
+        with sqlite_connection(self.db_path) as conn:
+            fetched = dict(conn.execute(f"SELECT acq_date, fetched_at FROM fire_days WHERE acq_date IN ({', '.join('?' * len(days))})",
+                                        days).fetchall())
+        now = time.time()
+        pending = []
+        for day in days:
+            fetched_at = fetched.get(day)
+            if fetched_at is None:
+                pending.append(day)
+                continue
+            settled_at = datetime.combine(date.fromisoformat(day) + timedelta(days=FIRE_SETTLE_DAYS + 1),
+                                          datetime.min.time(), timezone.utc).timestamp()
+            if fetched_at < settled_at and now - fetched_at > FIRE_REFRESH_SECONDS:
+                pending.append(day)
+        return pending
+
+    def replace_day(self, day, detections):
+        """Substitui os focos de um dia pelos recém-baixados."""
+        # acq_time faz parte da chave primária: focos sem horário são descartados
+        detections = detections.dropna(subset=["latitude", "longitude", "acq_date", "acq_time"])
+        detections = detections[detections["acq_date"].dt.strftime("%Y-%m-%d") == day]
+        latitude = detections["latitude"].to_numpy(dtype=float).round(5)
+        longitude = detections["longitude"].to_numpy(dtype=float).round(5)
+        rows = zip(
+            np.floor(latitude / FIRE_INDEX_DEGREES).astype(int).tolist(),
+            np.floor(longitude / FIRE_INDEX_DEGREES).astype(int).tolist(),
+            [day] * len(detections),
+            detections["acq_time"].astype(int).tolist(),
+            latitude.tolist(),
+            longitude.tolist(),
+            *(detections[column].astype(object).where(detections[column].notna(), None).tolist()
+              for column in ["satellite", "confidence", "frp", "daynight", "bright_ti4"])
+        )
+        with sqlite_connection(self.db_path) as conn, conn:
+            conn.execute("DELETE FROM fire_detections WHERE acq_date=?", (day,))
+            conn.executemany("INSERT OR IGNORE INTO fire_detections VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            conn.execute("INSERT OR REPLACE INTO fire_days VALUES (?, ?)", (day, time.time()))
+
+    def prune(self, oldest_day):
+        """Remove os dias anteriores a `oldest_day`."""
+        with sqlite_connection(self.db_path) as conn, conn:
+            conn.execute("DELETE FROM fire_detections WHERE acq_date < ?", (oldest_day,))
+            conn.execute("DELETE FROM fire_days WHERE acq_date < ?", (oldest_day,))
+
+    def sync(self, days):
+        """Baixa os dias pendentes (um por vez, agrupando chamadas concorrentes).
+
+        Retorna o número de dias baixados.
+        """
+        pending = self.pending_days(days)
+        for day in pending:
+            get_single_flight().do(f"firms:{self.area}:{day}", self._pull_day, day)
+        if pending:
+            oldest = (datetime.now(timezone.utc).date() - timedelta(days=FIRE_RETENTION_DAYS)).isoformat()
+            self.prune(oldest)
+        return len(pending)
+
+    def _pull_day(self, day):
+        get_cache_stats().record("firms", "upstream")
+        self.replace_day(day, fetch_fire_area(self.area, day))
+
+    def version(self, days):
+        """Identificador que muda sempre que algum dos dias é rebaixado."""
+        with sqlite_connection(self.db_path) as conn:
+            rows = conn.execute(f"SELECT acq_date, fetched_at FROM fire_days WHERE acq_date IN ({', '.join('?' * len(days))}) "
+                                "ORDER BY acq_date", days).fetchall()
+        return hashlib.sha256(repr(rows).encode("utf-8")).hexdigest()[:16]
+
+    def query(self, latitude, longitude, radius_km, start_date):
+        """Focos a até `radius_km` do ponto desde `start_date`, lidos das células do índice."""
+        min_lon, min_lat, max_lon, max_lat = _radius_bounds(latitude, longitude, radius_km)
+        col_range = (math.floor(min_lon / FIRE_INDEX_DEGREES), math.floor(max_lon / FIRE_INDEX_DEGREES))
+        with sqlite_connection(self.db_path) as conn:
+            rows = []
+            for cell_row in range(math.floor(min_lat / FIRE_INDEX_DEGREES), math.floor(max_lat / FIRE_INDEX_DEGREES) + 1):
+                rows.extend(conn.execute(f"SELECT {', '.join(FIRE_COLUMNS)} FROM fire_detections "
+                                         "WHERE cell_row=? AND cell_col BETWEEN ? AND ? AND acq_date >= ?",
+                                         (cell_row, *col_range, start_date)))
+        df = apply_fire_schema(pd.DataFrame(rows, columns=FIRE_COLUMNS))
+        if df.empty:
             return df
-        return pd.DataFrame()
+        distance = haversine_km(latitude, longitude, df["latitude"].to_numpy(), df["longitude"].to_numpy())
+        return df[distance <= radius_km].sort_values(["acq_date", "acq_time"], ignore_index=True)
+
+
+@st.cache_resource
+def get_fire_store():
+    """Instância única do arquivo local de focos de incêndio."""
+    return FireStore(FIRE_DB, FIRE_COVERAGE_AREA)
+
+
+def get_fire_data(latitude, longitude, radius_km=100, days_back=7):
+    """Obtém os focos de incêndio dos últimos `days_back` dias num raio da localização.
+
+    Dentro da região de cobertura a consulta é local (arquivo FireStore,
+    atualizado por dia); fora dela, os focos são buscados na NASA FIRMS.
+    """
+    get_cache_stats().record("firms", "request")
+    today = datetime.now(timezone.utc).date()
+    days = [(today - timedelta(days=offset)).isoformat() for offset in range(days_back - 1, -1, -1)]
+    store = get_fire_store()
+    if not store.covers(latitude, longitude, radius_km):
+        return _get_fire_area_cached(latitude, longitude, radius_km, days[0], days_back)
+
+    try:
+        if store.sync(days):
+            get_cache_stats().record("firms", "miss")
+    except requests.exceptions.RequestException as e:
+        st.error(f"Erro ao atualizar dados de focos de incêndio: {str(e)}. Verifique sua NASA_API_KEY. "
+                 "Exibindo os focos já armazenados.")
+    except Exception as e:
+        st.error(f"Erro inesperado ao processar dados de incêndio: {str(e)}. Exibindo os focos já armazenados.")
+    try:
+        df = store.query(latitude, longitude, radius_km, days[0])
+    except Exception as e:
+        st.error(f"Erro inesperado ao consultar os focos de incêndio: {str(e)}")
+        return empty_fire_frame()
+    df.attrs["version"] = hashlib.sha256(
+        f"{store.version(days)}:{latitude}:{longitude}:{radius_km}".encode("utf-8")).hexdigest()[:16]
+    return df
+
+
+@st.cache_data(ttl=600)  # Cache por 10 minutos
+def _get_fire_area_cached(latitude, longitude, radius_km, start_date, days_back):
+    """Focos num raio fora da região de cobertura, buscados direto na NASA FIRMS."""
+    get_cache_stats().record("firms", "miss")
+    get_cache_stats().record("firms", "upstream")
+    try:
+        area = ",".join(f"{value:.4f}" for value in _radius_bounds(latitude, longitude, radius_km))
+        df = fetch_fire_area(area, start_date, day_range=days_back).dropna(subset=["latitude", "longitude"])
+        # O retângulo da API inclui os cantos fora do raio
+        distance = haversine_km(latitude, longitude, df["latitude"].to_numpy(dtype=float), df["longitude"].to_numpy(dtype=float))
+        df = df[distance <= radius_km].reset_index(drop=True)
+        df.attrs["version"] = hashlib.sha256(
+            pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes()).hexdigest()[:16]
+        return df
 
     except requests.exceptions.RequestException as e:
         st.error(f"Erro ao obter dados de focos de incêndio: {str(e)}. Verifique sua NASA_API_KEY.")
-        return pd.DataFrame()
+        return empty_fire_frame()
     except Exception as e:
         st.error(f"Erro inesperado ao processar dados de incêndio: {str(e)}")
-        return pd.DataFrame()
+        return empty_fire_frame()
 
 
-def show_fire_data(city_data):
+def show_fire_data(city_data, location_fetch=None):
     """Exibe informações e mapa de focos de incêndio."""
     st.header("🔥 Monitoramento de Focos de Incêndio")
     st.info("Mostra focos de incêndio dos últimos 7 dias em um raio de 100km.")
 
     with st.spinner("Buscando dados de focos de incêndio..."):
-        fire_data = get_fire_data(city_data["latitude"], city_data["longitude"], radius_km=100)
+        if location_fetch is not None:
+            fire_data = location_fetch.result("fire", empty_fire_frame())
+        else:
+            fire_data = get_fire_data(city_data["latitude"], city_data["longitude"], radius_km=100)
 
     if fire_data.empty:
         st.success("✅ Nenhum foco de incêndio detectado nos últimos 7 dias na área.")
@@ -1019,56 +2737,163 @@ def show_fire_data(city_data):
     st.warning(f"⚠️ Foram detectados {len(fire_data)} focos de incêndio próximos nos últimos 7 dias!")
     columns_to_display = ['latitude', 'longitude', 'acq_date', 'confidence']
     filtered_fire_data = fire_data[[col for col in columns_to_display if col in fire_data.columns]]
-    st.dataframe(filtered_fire_data.rename(columns={'acq_date': 'Data Aquisição', 'confidence': 'Confiança (%)'}))
+    st.dataframe(filtered_fire_data.rename(columns={'acq_date': 'Data Aquisição', 'confidence': 'Confiança (%)'}),
+                 column_config={'Data Aquisição': st.column_config.DateColumn(format="DD/MM/YYYY")})
 
     st.subheader("🌍 Mapa de Focos de Incêndio")
-    fire_map = create_weather_map(city_data["latitude"], city_data["longitude"], city_data["name"], fire_data=fire_data)
-    folium_static(fire_map, width=700, height=500)
+    show_weather_map(city_data["latitude"], city_data["longitude"], city_data["name"], fire_data=fire_data)
+
 
+def lttb_indices(x, y, threshold):
+    """Índices escolhidos pelo Largest-Triangle-Three-Buckets para reduzir uma série.
 
-def show_air_quality_data(city_data):
+    Mantém o primeiro e o último ponto e, em cada bucket, o ponto que forma o
+    maior triângulo com o escolhido no bucket anterior e a média do seguinte,
+    preservando picos e vales.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    selected = np.empty(threshold, dtype=np.intp)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_end = edges[bucket + 2] if bucket + 2 < len(edges) else n
+        avg_x, avg_y = x[end:next_end].mean(), y[end:next_end].mean()
+        area = np.abs((x[previous] - avg_x) * (y[start:end] - y[previous])
+                      - (x[previous] - x[start:end]) * (avg_y - y[previous]))
+        previous = start + int(np.argmax(area))
+        selected[bucket + 1] = previous
+    return selected
+
+
+def downsample_long(df, x, columns, threshold):
+    """Formato longo (x, variável, valor) com cada coluna reduzida por LTTB."""
+    frames = []
+    for column in columns:
+        series = df[[x, column]].dropna()
+        kept = series.iloc[lttb_indices(series[x].astype("int64"), series[column], threshold)]
+        frames.append(pd.DataFrame({x: kept[x], "variable": column, "value": kept[column]}))
+    return pd.concat(frames, ignore_index=True)
+
+
+def air_quality_window(aq_data, hours):
+    """DataFrame das últimas `hours` horas (até a hora local atual da localização), com o IQA."""
+    hourly_aq = aq_data['hourly']
+    aqi_df = get_aqi_frame(data_version(aq_data), aq_data)
+    aq_df = pd.DataFrame({
+        "Hora": pd.to_datetime(hourly_aq['time']),
+        "PM10 (µg/m³)": hourly_aq.get('pm10'),
+        "PM2.5 (µg/m³)": hourly_aq.get('pm2_5'),
+        "Monóxido de Carbono (µg/m³)": hourly_aq.get('carbon_monoxide'),
+        "Dióxido de Nitrogênio (µg/m³)": hourly_aq.get('nitrogen_dioxide'),
+        "Dióxido de Enxofre (µg/m³)": hourly_aq.get('sulphur_dioxide'),
+        "Ozônio (µg/m³)": hourly_aq.get('ozone'),
+        "IQA": aqi_df["aqi"],
+        "Poluente Dominante": aqi_df["dominant"]
+    })
+    end = air_quality_now(aq_data)
+    return aq_df[(aq_df["Hora"] > end - pd.Timedelta(hours=hours)) & (aq_df["Hora"] <= end)].reset_index(drop=True)
+
+
+def show_air_quality_data(city_data, location_fetch=None):
     """Exibe dados de qualidade do ar."""
     st.header("🌬️ Qualidade do Ar")
-    aq_data = get_air_quality_data(city_data["latitude"], city_data["longitude"])
+    window_label = st.radio("Janela:", list(AIR_QUALITY_WINDOWS), horizontal=True, key="air_quality_window")
+    window_hours = AIR_QUALITY_WINDOWS[window_label]
+    if location_fetch is not None and "air_quality" in location_fetch.futures:
+        aq_data = location_fetch.result("air_quality")
+    else:
+        aq_data = get_air_quality_data(city_data["latitude"], city_data["longitude"], window_hours)
 
     if aq_data and aq_data.get('hourly'):
-        hourly_aq = aq_data['hourly']
-        aq_df = pd.DataFrame({
-            "Hora": pd.to_datetime(hourly_aq['time']),
-            "PM10 (µg/m³)": hourly_aq.get('pm10'),
-            "PM2.5 (µg/m³)": hourly_aq.get('pm2_5'),
-            "Monóxido de Carbono (µg/m³)": hourly_aq.get('carbon_monoxide'),
-            "Dióxido de Nitrogênio (µg/m³)": hourly_aq.get('nitrogen_dioxide'),
-            "Dióxido de Enxofre (µg/m³)": hourly_aq.get('sulphur_dioxide'),
-            "Ozônio (µg/m³)": hourly_aq.get('ozone')
-        })
+        aq_df = air_quality_window(aq_data, window_hours)
+
+        now_row = current_aqi(aq_data)
+        if now_row is not None:
+            cols_aqi = st.columns(2)
+            cols_aqi[0].metric("Índice de Qualidade do Ar (IQA)", int(now_row['aqi']), now_row['category'], delta_color="off")
+            cols_aqi[1].metric("Poluente Dominante", now_row['dominant'])
+            if now_row['aqi'] > AQI_ALERT_THRESHOLD:
+                st.warning(f"⚠️ Qualidade do ar {now_row['category'].lower()} (IQA {int(now_row['aqi'])}), "
+                           f"principalmente por {now_row['dominant']}.")
 
-        st.subheader("Principais Poluentes (Últimas Horas)")
-        st.dataframe(aq_df.tail(24).set_index("Hora"))
+        st.subheader(f"Principais Poluentes (Janela de {window_label})")
+        st.dataframe(aq_df.set_index("Hora"))
 
         if not aq_df.empty:
-            fig_pm = px.line(
-                aq_df, x="Hora", y=["PM2.5 (µg/m³)", "PM10 (µg/m³)"],
-                title="Partículas em Suspensão (PM2.5 e PM10)",
-                labels={"value": "Concentração (µg/m³)", "variable": "Poluente"}
-            )
-            fig_pm.update_layout(hovermode="x unified")
-            st.plotly_chart(fig_pm, use_container_width=True)
+            def build_pollutant_chart(columns, title, variable_label):
+                fig = px.line(
+                    downsample_long(aq_df, "Hora", columns, AIR_QUALITY_MAX_POINTS),
+                    x="Hora", y="value", color="variable", title=title,
+                    labels={"value": "Concentração (µg/m³)", "variable": variable_label}
+                )
+                fig.update_layout(hovermode="x unified")
+                return fig
 
-            fig_gases = px.line(
-                aq_df, x="Hora", y=["Monóxido de Carbono (µg/m³)", "Dióxido de Nitrogênio (µg/m³)", "Ozônio (µg/m³)"],
-                title="Gases Poluentes",
-                labels={"value": "Concentração (µg/m³)", "variable": "Gás"}
-            )
-            fig_gases.update_layout(hovermode="x unified")
-            st.plotly_chart(fig_gases, use_container_width=True)
+            def build_aqi_chart():
+                fig = px.line(
+                    downsample_long(aq_df, "Hora", ["IQA"], AIR_QUALITY_MAX_POINTS),
+                    x="Hora", y="value", title="Índice de Qualidade do Ar (IQA)", labels={"value": "IQA"}
+                )
+                lower = 0
+                for upper, label, color in AQI_CATEGORIES:
+                    fig.add_hrect(y0=lower, y1=upper, fillcolor=color, opacity=0.15, line_width=0,
+                                  annotation_text=label, annotation_position="top left")
+                    lower = upper
+                fig.update_layout(hovermode="x unified", showlegend=False,
+                                  yaxis=dict(range=[0, max(aq_df["IQA"].max() * 1.2, 60) if aq_df["IQA"].notna().any() else 60]))
+                return fig
+
+            aq_version = data_version(aq_data)
+            chart_options = dict(window=window_label, last_hour=aq_df["Hora"].iloc[-1].isoformat())
+            st.plotly_chart(cached_figure("air_quality_index", city_data["latitude"], city_data["longitude"],
+                                          aq_version, build_aqi_chart, **chart_options), use_container_width=True)
+            st.plotly_chart(cached_figure(
+                "air_quality_particles", city_data["latitude"], city_data["longitude"], aq_version,
+                lambda: build_pollutant_chart(["PM2.5 (µg/m³)", "PM10 (µg/m³)"], "Partículas em Suspensão (PM2.5 e PM10)", "Poluente"),
+                **chart_options
+            ), use_container_width=True)
+            st.plotly_chart(cached_figure(
+                "air_quality_gases", city_data["latitude"], city_data["longitude"], aq_version,
+                lambda: build_pollutant_chart(["Monóxido de Carbono (µg/m³)", "Dióxido de Nitrogênio (µg/m³)", "Ozônio (µg/m³)"],
+                                              "Gases Poluentes", "Gás"),
+                **chart_options
+            ), use_container_width=True)
     else:
         st.info("Nenhum dado de qualidade do ar disponível para esta localização.")
 
 
+def show_cache_metrics():
+    """Exibe a taxa de acerto dos caches por fonte de dados."""
+    stats = get_cache_stats()
+    rows = []
+    for namespace in stats.namespaces():
+        hit_ratio = stats.hit_ratio(namespace)
+        rows.append({
+            "Fonte": namespace,
+            "Requisições": stats.get(namespace, "request"),
+            "Acerto memória": f"{hit_ratio:.0%}" if hit_ratio is not None else "N/A",
+            "Acertos disco": stats.get(namespace, "disk_hit") + stats.get(namespace, "disk_stale"),
+            "Chamadas externas": stats.get(namespace, "upstream"),
+            "Chamadas economizadas": stats.get(namespace, "coalesced"),
+            "Montagem média (ms)": (f"{stats.get(namespace, 'build_ms') / stats.get(namespace, 'miss'):.1f}"
+                                    if stats.get(namespace, "build_ms") else "N/A")
+        })
+    if rows:
+        st.dataframe(pd.DataFrame(rows).set_index("Fonte"))
+    else:
+        st.caption("Nenhuma requisição registrada ainda.")
+
+
 # Interface principal
 def main():
     init_db()
+    get_report_job_worker()  # Retoma jobs pendentes da fila de laudos
 
     with st.sidebar:
         st.header("Serviços Profissionais")
@@ -1090,10 +2915,12 @@ def main():
         st.markdown("📞 **Contato:** contato@weatherpro.com")
         st.markdown("🌐 [www.weatherpro.com](https://www.weatherpro.com)")
 
+        with st.expander("📈 Métricas de Cache"):
+            show_cache_metrics()
+
         if st.button("📂 Ver Laudos Armazenados", key="view_reports_sidebar"):
             st.session_state.show_stored_reports = True
-        else:
-            st.session_state.show_stored_reports = False
+            st.session_state.reports_page_cursors = [None]
 
     st.header("🌍 Pesquisar por Localização")
 
@@ -1178,29 +3005,37 @@ def main():
             selected_city_data = city_options[selected_index]
 
     if selected_city_data:
-        weather_data = get_weather_data(selected_city_data["latitude"], selected_city_data["longitude"])
-        fire_data = get_fire_data(selected_city_data["latitude"], selected_city_data["longitude"])
-        air_quality_data = get_air_quality_data(selected_city_data["latitude"], selected_city_data["longitude"])
+        # A visão ainda não foi desenhada nesta execução, mas o valor do seletor já está no estado
+        active_view = st.session_state.get("active_view", "⏱️ Atual")
+        location_fetch = LocationFetch(selected_city_data["latitude"], selected_city_data["longitude"],
+                                       sources=view_sources(active_view))
+        weather_data = location_fetch.result("weather")
 
         if weather_data:
-            tabs = st.tabs([
-                "⏱️ Atual", "Previsão Horária", "📅 7 Dias", "📊 16 Dias",
-                "⚠️ Eventos Extremos", "🔥 Focos de Incêndio", "🌬️ Qualidade do Ar"
-            ])
-            with tabs[0]:
-                show_current_weather(selected_city_data, weather_data, fire_data, air_quality_data)
-            with tabs[1]:
-                show_hourly_summary_and_detailed_chart(selected_city_data, weather_data)
-            with tabs[2]:
-                show_weekly_forecast(selected_city_data, weather_data)
-            with tabs[3]:
-                show_extended_forecast(selected_city_data, weather_data)
-            with tabs[4]:
-                show_extreme_events(selected_city_data, weather_data)
-            with tabs[5]:
-                show_fire_data(selected_city_data)
-            with tabs[6]:
-                show_air_quality_data(selected_city_data)
+            forecast = get_forecast_data(weather_data)
+            # Só a visão ativa é montada; as demais não buscam dados nem montam gráficos
+            views = {
+                "⏱️ Atual": lambda: show_current_weather(selected_city_data, forecast, location_fetch=location_fetch),
+                "Previsão Horária": lambda: show_hourly_summary_and_detailed_chart(selected_city_data, forecast),
+                "📅 7 Dias": lambda: show_weekly_forecast(selected_city_data, forecast),
+                "📊 16 Dias": lambda: show_extended_forecast(selected_city_data, forecast),
+                "⚠️ Eventos Extremos": lambda: show_extreme_events(selected_city_data, forecast),
+                "🔥 Focos de Incêndio": lambda: show_fire_data(selected_city_data, location_fetch=location_fetch),
+                "🌬️ Qualidade do Ar": lambda: show_air_quality_data(selected_city_data, location_fetch=location_fetch),
+            }
+            active_view = st.radio("Visão:", list(views), horizontal=True, key="active_view", label_visibility="collapsed")
+            for key in PERSISTENT_VIEW_KEYS:
+                if key in st.session_state:
+                    st.session_state[key] = st.session_state[key]
+            views[active_view]()
+
+            # Focos e qualidade do ar já estão a caminho (LocationFetch); o histórico
+            # de eventos extremos também é aquecido em segundo plano, depois da visão ativa
+            if active_view != "⚠️ Eventos Extremos":
+                period_label = st.session_state.get("extreme_events_period", next(iter(EXTREME_EVENT_PERIODS)))
+                location_fetch.prefetch("history", get_history_window, selected_city_data["latitude"],
+                                        selected_city_data["longitude"], *extreme_events_window(period_label))
+        location_fetch.settle()
     elif st.session_state.get('show_stored_reports'):
         show_reports_section()
     else:
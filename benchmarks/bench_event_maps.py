@@ -0,0 +1,56 @@
+"""Benchmark: um mapa por evento extremo x um único mapa com a camada de eventos.
+
+Mede o tamanho do HTML enviado ao navegador e o tempo de montagem/renderização.
+
+Uso:
+    python benchmarks/bench_event_maps.py
+"""
+import os
+import sys
+import time
+
+import folium
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app import build_event_overlays, create_weather_map  # noqa: E402
+
+LATITUDE, LONGITUDE, CITY = -23.55, -46.63, "São Paulo"
+
+
+def render(m):
+    return folium.Figure().add_child(m).render()
+
+
+def one_map_per_event(events):
+    """Abordagem anterior: um mapa completo (tiles, MiniMap, Fullscreen, LayerControl) por evento."""
+    return [
+        render(create_weather_map(LATITUDE, LONGITUDE, CITY, overlays=[{
+            "latitude": LATITUDE, "longitude": LONGITUDE, "popup": f"Evento extremo em {event['date']}"
+        }]))
+        for event in events
+    ]
+
+
+def shared_events_map(events):
+    """Abordagem atual: um único mapa com todos os eventos numa camada."""
+    return [render(create_weather_map(LATITUDE, LONGITUDE, CITY, overlays=build_event_overlays(LATITUDE, LONGITUDE, events)))]
+
+
+def measure(func, events):
+    started = time.perf_counter()
+    pages = func(events)
+    return sum(len(page.encode("utf-8")) for page in pages), time.perf_counter() - started
+
+
+def main():
+    print(f"{'eventos':>8} {'abordagem':>22} {'HTML (KB)':>10} {'tempo (ms)':>11}")
+    for count in (10, 20):
+        events = [{"date": f"2025-01-{day + 1:02d}", "events": ["Precipitação extrema: 72.0 mm"]} for day in range(count)]
+        for label, func in (("um mapa por evento", one_map_per_event), ("mapa único", shared_events_map)):
+            size, elapsed = measure(func, events)
+            print(f"{count:>8} {label:>22} {size / 1024:>10.1f} {elapsed * 1000:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Benchmark: detecção de eventos extremos vetorizada x implementação original em laço.
+
+Uso:
+    python benchmarks/bench_extreme_events.py
+"""
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app import detect_extreme_events  # noqa: E402
+
+
+def detect_extreme_events_loop(weather_data):
+    """Implementação original (laço Python dia a dia), mantida como referência."""
+    extreme_events = []
+    threshold = {
+        'precipitation': 50,  # mm/dia
+        'wind_speed': 60,     # km/h
+        'heat_wave': 35,      # °C máxima por 3+ dias
+        'cold_wave': 5        # °C mínima por 3+ dias
+    }
+    daily_data = weather_data.get('daily', {})
+    dates = daily_data.get('time', [])
+
+    for i in range(len(dates)):
+        event = {'date': dates[i], 'events': []}
+        precip_value = daily_data.get('precipitation_sum', [0] * len(dates))[i] or 0
+        if precip_value > threshold['precipitation']:
+            event['events'].append(f"Precipitação extrema: {precip_value} mm")
+
+        wind_value = daily_data.get('wind_speed_10m_max', [0] * len(dates))[i] or 0
+        if wind_value > threshold['wind_speed']:
+            direction = daily_data.get('wind_direction_10m_dominant', [0] * len(dates))[i]
+            event['events'].append(f"Rajada de vento: {wind_value} km/h, direção {direction}°")
+
+        if i >= 2:
+            if all((daily_data.get('temperature_2m_max', [0] * len(dates))[j] or 0) >= threshold['heat_wave'] for j in range(i - 2, i + 1)):
+                event['events'].append("Onda de calor detectada")
+            if all((daily_data.get('temperature_2m_min', [0] * len(dates))[j] or 0) <= threshold['cold_wave'] for j in range(i - 2, i + 1)):
+                event['events'].append("Onda de frio detectada")
+
+        if event['events']:
+            extreme_events.append(event)
+    return extreme_events
+
+
+def synthetic_daily_data(years, seed=42):
+    """Gera séries diárias sintéticas no formato da API de arquivo do Open-Meteo."""
+    rnd = random.Random(seed)
+    days = years * 365
+    start = date(2000, 1, 1)
+
+    def maybe_none(value):
+        return None if rnd.random() < 0.01 else round(value, 1)
+
+    return {"daily": {
+        "time": [(start + timedelta(days=i)).isoformat() for i in range(days)],
+        "temperature_2m_max": [maybe_none(rnd.uniform(15, 40)) for _ in range(days)],
+        "temperature_2m_min": [maybe_none(rnd.uniform(-2, 22)) for _ in range(days)],
+        "precipitation_sum": [maybe_none(rnd.expovariate(1 / 8)) for _ in range(days)],
+        "wind_speed_10m_max": [maybe_none(rnd.uniform(5, 75)) for _ in range(days)],
+        "wind_direction_10m_dominant": [rnd.randint(0, 359) for _ in range(days)],
+    }}
+
+
+def best_of(func, data, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(data)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    print(f"{'anos':>5} {'dias':>7} {'laço (ms)':>11} {'vetorizado (ms)':>16} {'ganho':>7}")
+    for years in (1, 10, 50):
+        data = synthetic_daily_data(years)
+        assert detect_extreme_events(data) == detect_extreme_events_loop(data)
+        repeat = 5 if years < 50 else 3
+        loop_time = best_of(detect_extreme_events_loop, data, repeat)
+        vector_time = best_of(detect_extreme_events, data, repeat)
+        print(f"{years:>5} {years * 365:>7} {loop_time * 1000:>11.1f} {vector_time * 1000:>16.1f} {loop_time / vector_time:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
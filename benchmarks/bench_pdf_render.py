@@ -0,0 +1,58 @@
+"""Benchmark: geração de laudos em PDF em memória x via arquivo temporário.
+
+Uso:
+    python benchmarks/bench_pdf_render.py [quantidade]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from laudos import build_pdf_document, generate_pdf_report, generate_technical_report  # noqa: E402
+
+
+def generate_pdf_report_tempfile(report):
+    """Implementação anterior: grava o PDF num arquivo temporário e o lê de volta."""
+    pdf = build_pdf_document(report)
+    temp_file = tempfile.NamedTemporaryFile(delete=False, suffix='.pdf')
+    pdf_path = temp_file.name
+    pdf.output(pdf_path)
+
+    with open(pdf_path, 'rb') as f:
+        pdf_content = f.read()
+    os.remove(pdf_path)
+
+    return pdf_content
+
+
+def sample_report():
+    city = {"name": "São Paulo", "admin1": "São Paulo", "latitude": -23.55, "longitude": -46.63}
+    events = [
+        {"date": "2025-01-10", "events": ["Precipitação extrema: 82.4 mm", "Rajada de vento: 71.3 km/h, direção 200°"]},
+        {"date": "2025-01-11", "events": ["Onda de calor detectada"]},
+    ]
+    return generate_technical_report(events, city)
+
+
+def laudos_per_second(func, report, count):
+    started = time.perf_counter()
+    for _ in range(count):
+        func(report)
+    return count / (time.perf_counter() - started)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    report = sample_report()
+    # A data de criação embutida é a do laudo, então os dois caminhos geram os mesmos bytes
+    assert generate_pdf_report(report) == generate_pdf_report_tempfile(report)
+    before = laudos_per_second(generate_pdf_report_tempfile, report, count)
+    after = laudos_per_second(generate_pdf_report, report, count)
+    print(f"arquivo temporário: {before:8.1f} laudos/s")
+    print(f"em memória:         {after:8.1f} laudos/s ({after / before:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Benchmark: rótulos do gráfico de temperatura como anotações x trace em modo texto.
+
+Mede o tamanho do JSON da figura enviado ao navegador e o tempo de montagem
+para as visões horária (48 h) e de 16 dias.
+
+Uso:
+    python benchmarks/bench_temperature_chart.py
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app import build_temperature_figure, temperature_labels  # noqa: E402
+
+REPEAT = 20
+
+
+def sample_frame(periods, freq):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "Hora": pd.date_range("2025-01-01", periods=periods, freq=freq),
+        "Temperatura (°C)": rng.normal(24, 4, periods).round(1),
+        "Ícone": rng.choice(["☀️", "⛅", "🌧️"], periods)
+    })
+
+
+def annotations_figure(df, time_format):
+    """Abordagem anterior: uma anotação de layout por ponto, montada com iterrows."""
+    temperatures = df["Temperatura (°C)"]
+    spread = temperatures.max() - temperatures.min()
+    offset = spread * 0.15 if spread > 0 else 5
+    fig = go.Figure(go.Scatter(x=df["Hora"], y=temperatures, mode="lines+markers", name="Temperatura"))
+    annotations = []
+    for _, row in df.iterrows():
+        annotations.append(dict(
+            x=row["Hora"], y=row["Temperatura (°C)"] + offset, xref="x", yref="y",
+            text=f"{row['Hora'].strftime(time_format)}<br>{row['Ícone']}<br><b>{row['Temperatura (°C)']}°C</b>",
+            showarrow=False, xanchor="center", yanchor="bottom", font=dict(size=12, color="black"), align="center"
+        ))
+    fig.update_layout(annotations=annotations, hovermode="x unified", showlegend=False)
+    return fig
+
+
+def text_trace_figure(df, time_format):
+    """Abordagem atual: rótulos vetorizados numa única trace em modo texto."""
+    return build_temperature_figure(
+        df["Hora"], [(df["Temperatura (°C)"], dict(mode="lines+markers", name="Temperatura"))],
+        labels=temperature_labels(df["Hora"], df["Temperatura (°C)"], df["Ícone"], time_format=time_format),
+        time_format=time_format
+    )
+
+
+def measure(func, df, time_format):
+    started = time.perf_counter()
+    for _ in range(REPEAT):
+        spec = func(df, time_format).to_json()
+    return len(spec.encode("utf-8")), (time.perf_counter() - started) / REPEAT
+
+
+def main():
+    print(f"{'visão':>8} {'abordagem':>14} {'JSON (KB)':>10} {'tempo (ms)':>11}")
+    for label, df, time_format in (("48 h", sample_frame(48, "h"), "%H:%M"), ("16 dias", sample_frame(16, "D"), "%d/%m")):
+        for approach, func in (("anotações", annotations_figure), ("trace texto", text_trace_figure)):
+            size, elapsed = measure(func, df, time_format)
+            print(f"{label:>8} {approach:>14} {size / 1024:>10.1f} {elapsed * 1000:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Geração de laudos técnicos de eventos climáticos extremos (texto e PDF).
+
+Módulo sem dependência do Streamlit, para que a renderização possa rodar
+nos processos da fila de laudos.
+"""
+from datetime import datetime
+
+from fpdf import FPDF, FPDF_VERSION
+
+
+def generate_technical_report(event_data, city_data, satellite_images=None):
+    """Gera um laudo técnico para eventos extremos."""
+    report = {
+        'title': f"Laudo Técnico de Evento Climático Extremo - {city_data['name']}",
+        # Só o dia: o mesmo laudo gerado de novo no mesmo dia sai idêntico (e é deduplicado)
+        'date': datetime.now().strftime("%Y-%m-%d"),
+        'location': city_data,
+        'events': event_data,
+        'satellite_images': satellite_images,
+        'analysis': "Análise dos padrões climáticos observados.",
+        'recommendations': "Recomendações gerais para mitigar riscos e preparar para futuros eventos."
+    }
+    for event in event_data:
+        for e in event['events']:
+            if "Precipitação extrema" in e:
+                report['analysis'] += f"\n- Evento de precipitação intensa em {event['date']} pode indicar risco de alagamentos ou deslizamentos."
+            elif "Rajada de vento" in e:
+                report['analysis'] += f"\n- Rajadas de vento em {event['date']} podem ter causado danos a estruturas e vegetação."
+            elif "Onda de calor" in e:
+                report['analysis'] += f"\n- Período prolongado de calor em {event['date']} com impactos na saúde e consumo energético."
+            elif "Onda de frio" in e:
+                report['analysis'] += f"\n- Período prolongado de frio em {event['date']} com risco para agricultura e população vulnerável."
+    report['recommendations'] = """
+- Verificar estruturas físicas quanto a danos;
+- Monitorar áreas de risco para eventos futuros;
+- Acompanhar atualizações meteorológicas de fontes oficiais;
+- Implementar planos de contingência e evacuação conforme necessário;
+- Reforçar a infraestrutura em áreas de alto risco.
+"""
+    return report
+
+
+class LaudoPDF(FPDF):
+    """FPDF cuja data de criação é a data do laudo, e não o instante da renderização.
+
+    Assim os bytes do PDF dependem só do conteúdo do laudo, e o armazenamento
+    endereçado por SHA-256 reconhece o mesmo laudo gerado duas vezes.
+    """
+
+    def __init__(self, creation_date):
+        super().__init__()
+        self.creation_date = creation_date
+        if hasattr(self, "set_creation_date"):  # fpdf2
+            self.set_creation_date(creation_date)
+
+    def _putinfo(self):
+        # PyFPDF não permite fixar a data: reescreve o dicionário de informações
+        self._out('/Producer ' + self._textstring('PyFPDF ' + FPDF_VERSION + ' http://pyfpdf.googlecode.com/'))
+        for name in ('title', 'subject', 'author', 'keywords', 'creator'):
+            if hasattr(self, name):
+                self._out(f"/{name.capitalize()} " + self._textstring(getattr(self, name)))
+        self._out('/CreationDate ' + self._textstring('D:' + self.creation_date.strftime('%Y%m%d%H%M%S')))
+
+
+def build_pdf_document(report):
+    """Monta o documento FPDF do laudo técnico (sem renderizá-lo)."""
+    pdf = LaudoPDF(datetime.strptime(report['date'][:10], "%Y-%m-%d"))
+    pdf.add_page()
+    pdf.set_font("Arial", size=12)
+
+    pdf.set_font("Arial", 'B', 16)
+    pdf.cell(200, 10, txt=report['title'], ln=1, align='C')
+    pdf.set_font("Arial", size=12)
+    pdf.ln(10)
+
+    pdf.cell(200, 10, txt=f"Data do laudo: {report['date']}", ln=1)
+    pdf.cell(200, 10, txt=f"Local: {report['location']['name']}, {report['location'].get('admin1', '')}", ln=1)
+    pdf.ln(5)
+
+    pdf.set_font("Arial", 'B', 14)
+    pdf.cell(200, 10, txt="Eventos Detectados:", ln=1)
+    pdf.set_font("Arial", size=12)
+
+    for event in report['events']:
+        pdf.cell(200, 10, txt=f"Data: {event['date']}", ln=1)
+        for e in event['events']:
+            pdf.multi_cell(0, 10, txt=f"- {e}")
+        pdf.ln(2)
+
+    pdf.set_font("Arial", 'B', 14)
+    pdf.cell(200, 10, txt="Análise Técnica:", ln=1)
+    pdf.set_font("Arial", size=12)
+    pdf.multi_cell(0, 10, txt=report['analysis'])
+    pdf.ln(5)
+
+    pdf.set_font("Arial", 'B', 14)
+    pdf.cell(200, 10, txt="Recomendações:", ln=1)
+    pdf.set_font("Arial", size=12)
+    pdf.multi_cell(0, 10, txt=report['recommendations'])
+
+    return pdf
+
+
+def generate_pdf_report(report):
+    """Gera um PDF do laudo técnico usando FPDF, renderizado direto em memória."""
+    output = build_pdf_document(report).output(dest='S')
+    # PyFPDF devolve str latin-1; fpdf2 devolve bytearray
+    return output.encode('latin-1') if isinstance(output, str) else bytes(output)
+
+
+def render_laudo_pdf(event_data, city_data):
+    """Gera o laudo técnico dos eventos e devolve o PDF (usado pelos processos da fila)."""
+    return generate_pdf_report(generate_technical_report(event_data, city_data))
@@ -0,0 +1,46 @@
+"""Varredura em lote de eventos climáticos extremos para várias localidades.
+
+Uso:
+    python scan_events.py municipios.csv --start 2025-01-01 --end 2025-01-31 -o eventos.csv
+
+O CSV de entrada deve ter as colunas name, latitude e longitude (admin1 e
+country_code são opcionais e selecionam os limiares regionais).
+
+As localidades cuja busca falhar são informadas na saída de erro, e o
+comando termina com código 1 (os eventos das demais são gravados mesmo assim).
+"""
+import argparse
+import sys
+
+import pandas as pd
+
+from app import scan_extreme_events
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Varredura de eventos extremos em várias localidades.")
+    parser.add_argument("locations", help="CSV com as colunas name, latitude, longitude [, admin1, country_code]")
+    parser.add_argument("--start", required=True, help="Data inicial (AAAA-MM-DD)")
+    parser.add_argument("--end", required=True, help="Data final (AAAA-MM-DD)")
+    parser.add_argument("--workers", type=int, default=4, help="Requisições simultâneas à API de arquivo")
+    parser.add_argument("-o", "--output", help="Arquivo CSV de saída (padrão: saída padrão)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    locations = pd.read_csv(args.locations).to_dict("records")
+    events = scan_extreme_events(locations, args.start, args.end, max_workers=args.workers)
+    events.to_csv(args.output or sys.stdout, index=False)
+    failures = events.attrs.get("failures", [])
+    for failure in failures:
+        print(f"Falha em {failure['city']} ({failure['latitude']}, {failure['longitude']}): {failure['error']}",
+              file=sys.stderr)
+    if failures:
+        print(f"{len(failures)} de {len(locations)} localidades não puderam ser varridas.", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())